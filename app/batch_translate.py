@@ -0,0 +1,154 @@
+"""Traduz um arquivo de perguntas para SQL em lote, gravando os resultados em JSONL
+
+Uso:
+    python app/batch_translate.py --connection "Banco Principal" --input perguntas.txt --output resultados.jsonl
+
+O arquivo de entrada pode ter uma pergunta por linha (.txt), objetos JSON por
+linha com o campo "question" ou "query" (.jsonl) ou uma lista JSON de perguntas
+ou de objetos, como a gold_list.json (.json).
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cost_guard import estimate_query
+from database import _get_connections, get_schema_info
+from llm_client import LLMUnavailableError, get_llm_client, get_llm_stats
+from nlp_engine import translate_question, validate_query
+from settings import get_setting
+
+def _question_text(item):
+    if isinstance(item, dict):
+        return item.get("question") or item.get("query")
+    return item
+
+def load_questions(path):
+    """Lê as perguntas do arquivo (.txt, .jsonl ou .json), ignorando linhas vazias"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(".json"):
+            items = json.load(f)
+        elif path.endswith(".jsonl"):
+            items = [json.loads(line) for line in f if line.strip()]
+        else:
+            items = [line.strip() for line in f]
+    return [q.strip() for q in map(_question_text, items) if q and q.strip()]
+
+def _check_sql(sql, db_info, explain):
+    """Validação da consulta: regras de segurança e, com `explain`, o plano no banco
+
+    O EXPLAIN confirma que tabelas e colunas existem no schema atual (ex.:
+    SQL da lista de referência anterior a uma migração).
+    """
+    valid, message = validate_query(sql, db_info)
+    result = {"valid": valid, "message": message}
+    if valid and explain:
+        try:
+            cost, rows = estimate_query(sql, db_info)
+            result.update({"plan_cost": cost, "plan_rows": rows})
+        except Exception as e:
+            result.update({"valid": False, "message": f"EXPLAIN falhou: {str(e)}"})
+    return result
+
+def _translate_one(index, question, db_info, schema, use_cache, explain):
+    """Traduz e valida uma pergunta; erros ficam registrados no próprio resultado"""
+    result = {"index": index, "question": question}
+    started = time.perf_counter()
+    try:
+        translation = translate_question(question, db_info, use_cache=use_cache, schema=schema)
+    except Exception as e:
+        result.update({
+            "sql": None,
+            "valid": False,
+            "message": str(e),
+            "error": "llm_unavailable" if isinstance(e, LLMUnavailableError) else type(e).__name__,
+            "latency": time.perf_counter() - started,
+            "tokens": 0,
+        })
+        return result
+
+    latency = time.perf_counter() - started
+    result.update({
+        "sql": translation["sql"],
+        "source": translation["source"],
+        "latency": latency,
+        "tokens": translation.get("tokens", 0),
+    })
+    result.update(_check_sql(translation["sql"], db_info, explain))
+    return result
+
+def translate_batch(questions, db_info, concurrency=None, use_cache=False, explain=True):
+    """Traduz as perguntas em paralelo, gerando os resultados na ordem de entrada
+
+    Por padrão cada pergunta é gerada de novo: com `use_cache` o cache de
+    traduções e as perguntas parecidas devolveriam o próprio SQL já salvo,
+    o que anula a revalidação. Cada SQL é validado com EXPLAIN na conexão
+    (`explain`). O schema é lido uma única vez. `concurrency` (padrão
+    nlp_engine.batch.concurrency) limita as traduções simultâneas; as
+    chamadas ao modelo seguem também os limites do cliente (concorrência,
+    ritmo por minuto e espera em 429).
+    """
+    if concurrency is None:
+        concurrency = get_setting("nlp_engine", "batch.concurrency", 4)
+
+    schema = get_schema_info(db_info)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="neoquery-batch") as pool:
+        futures = [
+            pool.submit(_translate_one, i, question, db_info, schema, use_cache, explain)
+            for i, question in enumerate(questions)
+        ]
+        for future in futures:
+            yield future.result()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connection", required=True, help="Nome de uma conexão salva em connections.json")
+    parser.add_argument("--input", required=True, help="Arquivo de perguntas (.txt, .jsonl ou .json)")
+    parser.add_argument("--output", help="Arquivo JSONL de saída (padrão: saída padrão)")
+    parser.add_argument("--concurrency", type=int, help="Traduções simultâneas (padrão: nlp_engine.batch.concurrency)")
+    parser.add_argument("--rpm", type=int, help="Máximo de chamadas ao modelo por minuto")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="Reaproveita o cache de traduções e as perguntas parecidas (padrão: gerar tudo de novo)")
+    parser.add_argument("--no-explain", action="store_true", help="Valida sem executar EXPLAIN no banco")
+    args = parser.parse_args()
+
+    db_info = _get_connections().get(args.connection)
+    if not db_info:
+        parser.error(f"Conexão não encontrada: {args.connection}")
+    questions = load_questions(args.input)
+    if args.rpm is not None:
+        get_llm_client().requests_per_minute = args.rpm
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    started = time.perf_counter()
+    totals = {"valid": 0, "invalid": 0, "errors": 0, "tokens": 0}
+    try:
+        results = translate_batch(
+            questions, db_info, concurrency=args.concurrency, use_cache=args.use_cache, explain=not args.no_explain
+        )
+        for result in results:
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            if result.get("error"):
+                totals["errors"] += 1
+            elif result["valid"]:
+                totals["valid"] += 1
+            else:
+                totals["invalid"] += 1
+            totals["tokens"] += result["tokens"] or 0
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    stats = get_llm_stats()
+    print(
+        f"{len(questions)} perguntas em {elapsed:.1f}s: {totals['valid']} válidas, "
+        f"{totals['invalid']} inválidas, {totals['errors']} erros, {totals['tokens']} tokens "
+        f"({stats.get('retries', 0)} repetições por limite de taxa ou falha)",
+        file=sys.stderr
+    )
+
+if __name__ == "__main__":
+    main()
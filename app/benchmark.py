@@ -0,0 +1,70 @@
+"""Compara a leitura de resultados via cursor com a leitura via COPY (PostgreSQL)
+
+Uso:
+    python app/benchmark.py --connection "Banco Principal" --query "SELECT * FROM vendas" --repeat 3
+"""
+import argparse
+import time
+
+from database import _get_connections, execute_query_stream
+from settings import get_setting
+
+def _measure(query, db_info, fast_path, max_rows):
+    """Executa a consulta uma vez e retorna (linhas, segundos, bytes em memória)"""
+    started = time.perf_counter()
+    stream = execute_query_stream(query, db_info, max_rows=max_rows, use_cache=False, fast_path=fast_path)
+    df = stream.to_dataframe()
+    elapsed = time.perf_counter() - started
+    if stream.error:
+        raise RuntimeError(stream.error)
+    return len(df), elapsed, int(df.memory_usage(deep=True).sum())
+
+def benchmark_fetch(query, db_info, repeat=3, max_rows=None):
+    """Mede linhas/segundo do caminho por cursor e do caminho via COPY
+
+    Sem `max_rows`, usa o mesmo limite de linhas da aplicação
+    (database.max_rows_return); 0 lê o resultado inteiro.
+    """
+    if max_rows is None:
+        max_rows = get_setting("database", "max_rows_return", 10000)
+    results = {}
+    for label, fast_path in (("cursor", False), ("copy", True)):
+        runs = [_measure(query, db_info, fast_path, max_rows) for _ in range(repeat)]
+        rows = runs[0][0]
+        best = min(elapsed for _, elapsed, _ in runs)
+        results[label] = {
+            "rows": rows,
+            "best_seconds": best,
+            "rows_per_second": rows / best if best else 0.0,
+            "memory_bytes": runs[0][2],
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connection", required=True, help="Nome de uma conexão salva em connections.json")
+    parser.add_argument("--query", required=True, help="Consulta SQL a ser medida")
+    parser.add_argument("--repeat", type=int, default=3, help="Número de execuções por caminho")
+    parser.add_argument("--max-rows", type=int,
+                        help="Limite de linhas (padrão: database.max_rows_return; 0 = sem limite)")
+    args = parser.parse_args()
+
+    db_info = _get_connections().get(args.connection)
+    if not db_info:
+        parser.error(f"Conexão não encontrada: {args.connection}")
+    if db_info["type"] != "PostgreSQL":
+        parser.error("O caminho via COPY só está disponível para PostgreSQL")
+
+    results = benchmark_fetch(args.query, db_info, repeat=args.repeat, max_rows=args.max_rows)
+
+    print(f"{'caminho':<8} {'linhas':>10} {'melhor (s)':>11} {'linhas/s':>12} {'memória (MB)':>13}")
+    for label, r in results.items():
+        print(f"{label:<8} {r['rows']:>10} {r['best_seconds']:>11.3f} "
+              f"{r['rows_per_second']:>12.0f} {r['memory_bytes'] / 1024 / 1024:>13.1f}")
+
+    if results["cursor"]["best_seconds"] and results["copy"]["best_seconds"]:
+        speedup = results["cursor"]["best_seconds"] / results["copy"]["best_seconds"]
+        print(f"\nCOPY foi {speedup:.1f}x mais rápido que o cursor")
+
+if __name__ == "__main__":
+    main()
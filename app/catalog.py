@@ -0,0 +1,328 @@
+import sys
+
+from settings import get_setting
+
+# Número de linhas lidas por vez ao percorrer catálogos grandes
+CATALOG_FETCH_SIZE = 5000
+
+def _new_schema():
+    return {
+        "tables": [],
+        "relationships": []
+    }
+
+def _table_name(schema, table, default_schema):
+    """Nome da tabela como deve aparecer no SQL (qualificado fora do schema padrão)"""
+    if schema is None or schema == default_schema:
+        return table
+    return f"{schema}.{table}"
+
+def _iter_rows(cursor, size=CATALOG_FETCH_SIZE):
+    """Percorre o resultado de um cursor em blocos, sem carregar tudo de uma vez"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        for row in rows:
+            yield row
+
+def _build_tables(rows, default_schema):
+    """Agrupa linhas (schema, tabela, coluna, tipo) ordenadas por tabela"""
+    tables = []
+    index = {}
+    current = None
+    current_key = None
+
+    for schema, table, column, data_type in rows:
+        key = (schema, table)
+        if key != current_key:
+            current = {
+                "name": _table_name(schema, table, default_schema),
+                "columns": []
+            }
+            tables.append(current)
+            index[key] = current
+            current_key = key
+
+        # Os tipos se repetem muito; internar reduz a memória em catálogos grandes
+        current["columns"].append({"name": column, "type": sys.intern(data_type)})
+
+    return tables, index
+
+def _add_primary_keys(index, rows):
+    """Associa as colunas de chave primária às tabelas já carregadas"""
+    for schema, table, column in rows:
+        table_info = index.get((schema, table))
+        if table_info is not None:
+            table_info.setdefault("primary_key", []).append(column)
+
+def _build_relationships(rows, default_schema):
+    return [
+        {
+            "table": _table_name(schema, table, default_schema),
+            "column": column,
+            "foreign_table": _table_name(foreign_schema, foreign_table, default_schema),
+            "foreign_column": foreign_column
+        }
+        for schema, table, column, foreign_schema, foreign_table, foreign_column in rows
+    ]
+
+def _configured_schemas(db_info):
+    """Schemas a introspectar: os da conexão, os do config.yaml ou todos"""
+    schemas = db_info.get("schemas") or get_setting("database", "schemas")
+    if isinstance(schemas, str):
+        schemas = [s.strip() for s in schemas.split(",") if s.strip()]
+    return schemas or None
+
+# --- PostgreSQL ---------------------------------------------------------------
+
+PG_SCHEMAS_QUERY = """
+    SELECT nspname
+    FROM pg_catalog.pg_namespace
+    WHERE nspname NOT IN ('pg_catalog', 'information_schema')
+      AND nspname NOT LIKE 'pg_toast%'
+      AND nspname NOT LIKE 'pg_temp%'
+"""
+
+PG_COLUMNS_QUERY = """
+    SELECT n.nspname, c.relname, a.attname, format_type(a.atttypid, a.atttypmod)
+    FROM pg_catalog.pg_attribute a
+    JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind IN ('r', 'v', 'm', 'p', 'f')
+      AND NOT c.relispartition
+      AND a.attnum > 0
+      AND NOT a.attisdropped
+      AND n.nspname = ANY(%s)
+    ORDER BY n.nspname, c.relname, a.attnum
+"""
+
+PG_PRIMARY_KEYS_QUERY = """
+    SELECT n.nspname, c.relname, a.attname
+    FROM pg_catalog.pg_constraint con
+    JOIN pg_catalog.pg_class c ON c.oid = con.conrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    JOIN LATERAL unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord) ON true
+    JOIN pg_catalog.pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+    WHERE con.contype = 'p'
+      AND n.nspname = ANY(%s)
+    ORDER BY n.nspname, c.relname, k.ord
+"""
+
+PG_FOREIGN_KEYS_QUERY = """
+    SELECT n.nspname, c.relname, a.attname, fn.nspname, fc.relname, fa.attname
+    FROM pg_catalog.pg_constraint con
+    JOIN pg_catalog.pg_class c ON c.oid = con.conrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_catalog.pg_class fc ON fc.oid = con.confrelid
+    JOIN pg_catalog.pg_namespace fn ON fn.oid = fc.relnamespace
+    JOIN LATERAL unnest(con.conkey, con.confkey) AS k(attnum, fattnum) ON true
+    JOIN pg_catalog.pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+    JOIN pg_catalog.pg_attribute fa ON fa.attrelid = con.confrelid AND fa.attnum = k.fattnum
+    WHERE con.contype = 'f'
+      AND n.nspname = ANY(%s)
+    ORDER BY n.nspname, c.relname, con.conname
+"""
+
+def _load_bulk(columns_cursor, cursor, queries, params, default_schema):
+    """Executa as consultas de colunas, chaves primárias e estrangeiras
+
+    `queries` é a tupla (colunas, chaves primárias, chaves estrangeiras);
+    as colunas são lidas de `columns_cursor`, que pode ser do lado do
+    servidor, e agrupadas por tabela sem materializar o resultado inteiro.
+    """
+    columns_query, primary_keys_query, foreign_keys_query = queries
+    schema_info = _new_schema()
+
+    columns_cursor.execute(columns_query, params)
+    tables, index = _build_tables(_iter_rows(columns_cursor), default_schema)
+    columns_cursor.close()
+    schema_info["tables"] = tables
+
+    cursor.execute(primary_keys_query, params)
+    _add_primary_keys(index, _iter_rows(cursor))
+
+    cursor.execute(foreign_keys_query, params)
+    schema_info["relationships"] = _build_relationships(_iter_rows(cursor), default_schema)
+
+    cursor.close()
+    return schema_info
+
+def load_postgres_catalog(conn, db_info):
+    """Carrega tabelas, colunas, chaves primárias e estrangeiras do PostgreSQL"""
+    cursor = conn.cursor()
+    schemas = _configured_schemas(db_info)
+    if not schemas:
+        cursor.execute(PG_SCHEMAS_QUERY)
+        schemas = [row[0] for row in cursor.fetchall()]
+    default_schema = "public" if "public" in schemas else None
+
+    # Cursor nomeado (server-side) para a consulta de colunas
+    columns_cursor = conn.cursor(name="neoquery_catalog_columns")
+    columns_cursor.itersize = CATALOG_FETCH_SIZE
+
+    queries = (PG_COLUMNS_QUERY, PG_PRIMARY_KEYS_QUERY, PG_FOREIGN_KEYS_QUERY)
+    return _load_bulk(columns_cursor, cursor, queries, (schemas,), default_schema)
+
+# --- MySQL --------------------------------------------------------------------
+
+MYSQL_COLUMNS_QUERY = """
+    SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, COLUMN_TYPE
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA IN ({schemas})
+    ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION
+"""
+
+MYSQL_PRIMARY_KEYS_QUERY = """
+    SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME
+    FROM information_schema.KEY_COLUMN_USAGE
+    WHERE CONSTRAINT_NAME = 'PRIMARY'
+      AND TABLE_SCHEMA IN ({schemas})
+    ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION
+"""
+
+MYSQL_FOREIGN_KEYS_QUERY = """
+    SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME,
+           REFERENCED_TABLE_SCHEMA, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+    FROM information_schema.KEY_COLUMN_USAGE
+    WHERE REFERENCED_TABLE_NAME IS NOT NULL
+      AND TABLE_SCHEMA IN ({schemas})
+    ORDER BY TABLE_SCHEMA, TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+"""
+
+def load_mysql_catalog(conn, db_info):
+    """Carrega tabelas, colunas, chaves primárias e estrangeiras do MySQL"""
+    import pymysql.cursors
+
+    schemas = _configured_schemas(db_info) or [db_info["database"]]
+    placeholders = ", ".join(["%s"] * len(schemas))
+    queries = tuple(
+        q.format(schemas=placeholders)
+        for q in (MYSQL_COLUMNS_QUERY, MYSQL_PRIMARY_KEYS_QUERY, MYSQL_FOREIGN_KEYS_QUERY)
+    )
+
+    # SSCursor lê as linhas sob demanda, sem armazenar o resultado no cliente
+    columns_cursor = conn.cursor(pymysql.cursors.SSCursor)
+    return _load_bulk(columns_cursor, conn.cursor(), queries, tuple(schemas), db_info["database"])
+
+# --- SQL Server ---------------------------------------------------------------
+
+MSSQL_COLUMNS_QUERY = """
+    SELECT s.name, o.name, c.name, t.name
+    FROM sys.columns c
+    JOIN sys.objects o ON o.object_id = c.object_id
+    JOIN sys.schemas s ON s.schema_id = o.schema_id
+    JOIN sys.types t ON t.user_type_id = c.user_type_id
+    WHERE o.type IN ('U', 'V')
+      AND o.is_ms_shipped = 0
+      {schema_filter}
+    ORDER BY s.name, o.name, c.column_id
+"""
+
+MSSQL_PRIMARY_KEYS_QUERY = """
+    SELECT s.name, o.name, c.name
+    FROM sys.indexes i
+    JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+    JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+    JOIN sys.objects o ON o.object_id = i.object_id
+    JOIN sys.schemas s ON s.schema_id = o.schema_id
+    WHERE i.is_primary_key = 1
+      AND o.is_ms_shipped = 0
+      {schema_filter}
+    ORDER BY s.name, o.name, ic.key_ordinal
+"""
+
+MSSQL_FOREIGN_KEYS_QUERY = """
+    SELECT s.name, o.name, c.name, rs.name, ro.name, rc.name
+    FROM sys.foreign_key_columns fkc
+    JOIN sys.objects o ON o.object_id = fkc.parent_object_id
+    JOIN sys.schemas s ON s.schema_id = o.schema_id
+    JOIN sys.columns c ON c.object_id = fkc.parent_object_id AND c.column_id = fkc.parent_column_id
+    JOIN sys.objects ro ON ro.object_id = fkc.referenced_object_id
+    JOIN sys.schemas rs ON rs.schema_id = ro.schema_id
+    JOIN sys.columns rc ON rc.object_id = fkc.referenced_object_id AND rc.column_id = fkc.referenced_column_id
+    WHERE o.is_ms_shipped = 0
+      {schema_filter}
+    ORDER BY s.name, o.name, fkc.constraint_object_id, fkc.constraint_column_id
+"""
+
+def load_sqlserver_catalog(conn, db_info):
+    """Carrega tabelas, colunas, chaves primárias e estrangeiras do SQL Server"""
+    schemas = _configured_schemas(db_info)
+    schema_filter = ""
+    params = ()
+    if schemas:
+        schema_filter = "AND s.name IN ({})".format(", ".join(["?"] * len(schemas)))
+        params = tuple(schemas)
+
+    queries = tuple(
+        q.format(schema_filter=schema_filter)
+        for q in (MSSQL_COLUMNS_QUERY, MSSQL_PRIMARY_KEYS_QUERY, MSSQL_FOREIGN_KEYS_QUERY)
+    )
+    return _load_bulk(conn.cursor(), conn.cursor(), queries, params, "dbo")
+
+# --- Oracle -------------------------------------------------------------------
+
+ORACLE_COLUMNS_QUERY = """
+    SELECT owner, table_name, column_name, data_type
+    FROM all_tab_columns
+    WHERE owner IN ({owners})
+      AND table_name NOT LIKE 'BIN$%'
+    ORDER BY owner, table_name, column_id
+"""
+
+ORACLE_PRIMARY_KEYS_QUERY = """
+    SELECT cc.owner, cc.table_name, cc.column_name
+    FROM all_constraints c
+    JOIN all_cons_columns cc ON cc.owner = c.owner AND cc.constraint_name = c.constraint_name
+    WHERE c.constraint_type = 'P'
+      AND c.owner IN ({owners})
+    ORDER BY cc.owner, cc.table_name, cc.position
+"""
+
+ORACLE_FOREIGN_KEYS_QUERY = """
+    SELECT cc.owner, cc.table_name, cc.column_name, rcc.owner, rcc.table_name, rcc.column_name
+    FROM all_constraints c
+    JOIN all_cons_columns cc ON cc.owner = c.owner AND cc.constraint_name = c.constraint_name
+    JOIN all_cons_columns rcc ON rcc.owner = c.r_owner
+                             AND rcc.constraint_name = c.r_constraint_name
+                             AND rcc.position = cc.position
+    WHERE c.constraint_type = 'R'
+      AND c.owner IN ({owners})
+    ORDER BY cc.owner, cc.table_name, c.constraint_name, cc.position
+"""
+
+def load_oracle_catalog(conn, db_info):
+    """Carrega tabelas, colunas, chaves primárias e estrangeiras do Oracle"""
+    cursor = conn.cursor()
+    cursor.arraysize = CATALOG_FETCH_SIZE
+
+    cursor.execute("SELECT USER FROM DUAL")
+    current_user = cursor.fetchone()[0]
+    owners = [s.upper() for s in (_configured_schemas(db_info) or [current_user])]
+
+    binds = {f"owner{i}": owner for i, owner in enumerate(owners)}
+    placeholders = ", ".join(f":{name}" for name in binds)
+    queries = tuple(
+        q.format(owners=placeholders)
+        for q in (ORACLE_COLUMNS_QUERY, ORACLE_PRIMARY_KEYS_QUERY, ORACLE_FOREIGN_KEYS_QUERY)
+    )
+
+    columns_cursor = conn.cursor()
+    columns_cursor.arraysize = CATALOG_FETCH_SIZE
+    return _load_bulk(columns_cursor, cursor, queries, binds, current_user)
+
+# Carregadores disponíveis por tipo de banco
+CATALOG_LOADERS = {
+    "PostgreSQL": load_postgres_catalog,
+    "MySQL": load_mysql_catalog,
+    "SQL Server": load_sqlserver_catalog,
+    "Oracle": load_oracle_catalog,
+}
+
+def load_catalog(conn, db_info):
+    """Carrega o catálogo do banco com o carregador do dialeto correspondente"""
+    loader = CATALOG_LOADERS.get(db_info["type"])
+    if loader is None:
+        return _new_schema()
+    return loader(conn, db_info)
@@ -0,0 +1,100 @@
+import datetime
+import re
+
+import numpy as np
+import pandas as pd
+
+from settings import get_setting
+
+# Textos de data aceitos: AAAA-MM-DD, com hora e fuso opcionais (anos soltos não contam)
+ISO_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?:Z|[+-]\d{2}:?\d{2})?')
+
+def _memory(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def _downcast_integers(series):
+    if pd.api.types.is_extension_array_dtype(series.dtype):
+        # Inteiros anuláveis (Int64): reduzir mantendo o suporte a nulos
+        if series.isna().all():
+            return series
+        low, high = series.min(), series.max()
+        for dtype in ("Int8", "Int16", "Int32"):
+            info = np.iinfo(dtype.lower())
+            if info.min <= low and high <= info.max:
+                return series.astype(dtype)
+        return series
+    return pd.to_numeric(series, downcast="integer")
+
+def _downcast_floats(series):
+    # Só reduz para float32 se não houver perda de precisão (ex.: valores monetários)
+    reduced = series.astype("float32")
+    if ((reduced.astype("float64") == series) | series.isna()).all():
+        return reduced
+    return series
+
+def _parse_dates(series):
+    """Coluna convertida para datetime, ou None se algum valor não for uma data
+
+    Todos os valores não nulos precisam ser datas ou textos AAAA-MM-DD; a
+    conversão é estrita, então nenhum valor vira NaT silenciosamente.
+    """
+    values = series.dropna()
+    if values.empty:
+        return None
+    if values.map(lambda v: isinstance(v, (datetime.date, datetime.datetime))).all():
+        return pd.to_datetime(series, errors="raise")
+    if not values.map(lambda v: isinstance(v, str)).all():
+        return None
+    if not values.str.fullmatch(ISO_DATE_RE).all():
+        return None
+    return pd.to_datetime(series, format="ISO8601", errors="raise")
+
+def compact_dataframe(df, category_threshold=None):
+    """Reduz a memória de um DataFrame de resultados
+
+    Reduz os tipos numéricos, converte textos com poucos valores distintos em
+    categorias e converte colunas de datas uma única vez. Retorna o DataFrame
+    compactado e um relatório com a memória antes e depois.
+    """
+    before = _memory(df)
+    if not get_setting("database", "compaction.enabled", True) or df.empty:
+        return df, {"before": before, "after": before, "columns": {}}
+
+    if category_threshold is None:
+        category_threshold = get_setting("database", "compaction.category_threshold", 0.5)
+
+    df = df.copy(deep=False)
+    changed = {}
+
+    for position, column in enumerate(df.columns):
+        series = df.iloc[:, position]
+        dtype = series.dtype
+        try:
+            if pd.api.types.is_bool_dtype(dtype):
+                continue
+            if pd.api.types.is_integer_dtype(dtype):
+                new = _downcast_integers(series)
+            elif pd.api.types.is_float_dtype(dtype):
+                new = _downcast_floats(series)
+            elif dtype == object:
+                dates = _parse_dates(series)
+                if dates is not None:
+                    new = dates
+                elif series.nunique(dropna=True) <= category_threshold * len(series) \
+                        and series.dropna().map(lambda v: isinstance(v, str)).all():
+                    new = series.astype("category")
+                else:
+                    continue
+            else:
+                continue
+        except (ValueError, TypeError, OverflowError):
+            continue
+
+        if new.dtype != dtype:
+            df.isetitem(position, new)
+            changed[column] = f"{dtype} -> {new.dtype}"
+
+    after = _memory(df)
+    df.attrs["memory_before"] = before
+    df.attrs["memory_after"] = after
+    return df, {"before": before, "after": after, "columns": changed}
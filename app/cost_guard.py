@@ -0,0 +1,175 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+
+from database import get_connection
+from pool import pool_label
+from result_cache import normalize_sql
+from settings import get_setting
+from sql_rewrite import add_row_limit
+
+# Estimativas de plano já calculadas: impressão digital do SQL -> (estimativa, expira_em)
+_plan_cache = {}
+_plan_cache_lock = threading.Lock()
+
+def sql_fingerprint(sql, db_info):
+    """Impressão digital do SQL normalizado nesta conexão"""
+    text = f"{pool_label(db_info)}\n{normalize_sql(sql)}"
+    return hashlib.sha1(text.encode()).hexdigest()
+
+def _explain_postgres(cursor, sql):
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    return float(root["Total Cost"]), float(root["Plan Rows"])
+
+def _explain_mysql(cursor, sql):
+    cursor.execute(f"EXPLAIN FORMAT=JSON {sql}")
+    plan = json.loads(cursor.fetchone()[0])
+    cost = float(plan["query_block"].get("cost_info", {}).get("query_cost", 0))
+
+    # A maior quantidade de linhas produzidas por junção é a estimativa do resultado
+    rows = 0.0
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if "rows_produced_per_join" in node:
+                rows = max(rows, float(node["rows_produced_per_join"]))
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return cost, rows
+
+def _explain_sqlserver(cursor, sql):
+    cursor.execute("SET SHOWPLAN_XML ON")
+    try:
+        cursor.execute(sql)
+        plan_xml = cursor.fetchone()[0]
+    finally:
+        cursor.execute("SET SHOWPLAN_XML OFF")
+
+    cost = re.search(r'StatementSubTreeCost="([^"]+)"', plan_xml)
+    rows = re.search(r'StatementEstRows="([^"]+)"', plan_xml)
+    return (float(cost.group(1)) if cost else 0.0), (float(rows.group(1)) if rows else 0.0)
+
+def _explain_oracle(cursor, sql):
+    # Identificador único (até 30 caracteres): estimativas simultâneas não leem o plano uma da outra
+    statement_id = f"nq{uuid.uuid4().hex[:28]}"
+    try:
+        cursor.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{statement_id}' FOR {sql}")
+        cursor.execute(
+            "SELECT cost, cardinality FROM plan_table WHERE statement_id = :sid AND id = 0",
+            {"sid": statement_id}
+        )
+        cost, rows = cursor.fetchone()
+    finally:
+        cursor.execute("DELETE FROM plan_table WHERE statement_id = :sid", {"sid": statement_id})
+    return float(cost or 0), float(rows or 0)
+
+EXPLAINERS = {
+    "PostgreSQL": _explain_postgres,
+    "MySQL": _explain_mysql,
+    "SQL Server": _explain_sqlserver,
+    "Oracle": _explain_oracle,
+}
+
+def estimate_query(sql, db_info):
+    """Retorna (custo estimado, linhas estimadas) do plano da consulta, com cache"""
+    key = sql_fingerprint(sql, db_info)
+    now = time.time()
+    with _plan_cache_lock:
+        cached = _plan_cache.get(key)
+        if cached and cached[1] > now:
+            return cached[0]
+
+    explain = EXPLAINERS[db_info["type"]]
+    with get_connection(db_info) as conn:
+        cursor = conn.cursor()
+        try:
+            estimate = explain(cursor, sql.strip().rstrip(";"))
+        finally:
+            cursor.close()
+
+    ttl = get_setting("database", "cost_guard.cache_ttl", 3600)
+    with _plan_cache_lock:
+        _plan_cache[key] = (estimate, now + ttl)
+    return estimate
+
+def _prefetch(sql, db_info):
+    try:
+        estimate_query(sql, db_info)
+    except Exception:
+        # check_query_cost repete a estimativa e informa o erro
+        pass
+
+def prefetch_estimate(sql, db_info):
+    """Calcula a estimativa do plano em segundo plano
+
+    check_query_cost reaproveita o resultado pelo cache de planos. Retorna a
+    thread iniciada (para aguardar com join) ou None se o controle de custo
+    estiver desativado.
+    """
+    if not get_setting("database", "cost_guard.enabled", True):
+        return None
+    thread = threading.Thread(target=_prefetch, args=(sql, db_info), name="neoquery-explain", daemon=True)
+    thread.start()
+    return thread
+
+def _plan_thresholds(plan):
+    plans = get_setting("database", "cost_guard.plans", {}) or {}
+    default_plan = get_setting("database", "cost_guard.default_plan", "basic")
+    return plans.get(plan) or plans.get(default_plan) or {}
+
+def check_query_cost(sql, db_info, plan=None):
+    """Avalia o custo estimado da consulta antes de executá-la
+
+    Retorna um dicionário com `action` ("allow", "warn", "limit" ou "block"),
+    o `sql` a executar (com LIMIT adicionado quando a ação for "limit"),
+    `cost`, `rows` e uma `message` para o usuário. Os limites vêm do plano
+    de assinatura (database.cost_guard.plans no config.yaml).
+    """
+    result = {"action": "allow", "sql": sql, "cost": None, "rows": None, "message": ""}
+    if not get_setting("database", "cost_guard.enabled", True):
+        return result
+
+    try:
+        cost, rows = estimate_query(sql, db_info)
+    except Exception as e:
+        # Sem plano não há como avaliar: a consulta segue com os limites de execução
+        result["message"] = f"Não foi possível estimar o custo da consulta: {str(e)}"
+        return result
+
+    # Custos de dialetos diferentes são normalizados para uma escala comum
+    units = get_setting("database", "cost_guard.cost_units", {}) or {}
+    cost *= units.get(db_info["type"], 1)
+    result.update({"cost": cost, "rows": rows})
+
+    thresholds = _plan_thresholds(plan)
+    block_cost = thresholds.get("block_cost")
+    warn_cost = thresholds.get("warn_cost")
+    limit_rows = thresholds.get("limit_rows")
+
+    if block_cost and cost > block_cost:
+        result["action"] = "block"
+        result["message"] = (
+            f"Consulta bloqueada: custo estimado {cost:,.0f} acima do limite do plano ({block_cost:,.0f})."
+        )
+    elif limit_rows and rows > limit_rows:
+        max_rows = get_setting("database", "max_rows_return", 10000)
+        result["action"] = "limit"
+        result["sql"] = add_row_limit(sql, db_info["type"], max_rows)
+        result["message"] = (
+            f"A consulta deve retornar cerca de {rows:,.0f} linhas; "
+            f"o resultado foi limitado a {max_rows} linhas."
+        )
+    elif warn_cost and cost > warn_cost:
+        result["action"] = "warn"
+        result["message"] = f"Consulta potencialmente cara: custo estimado {cost:,.0f}."
+
+    return result
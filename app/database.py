@@ -7,8 +7,25 @@ import cx_Oracle
 import sqlparse
 import json
 import os
+import hashlib
+import uuid
+import threading
+import tempfile
+import time
+from contextlib import contextmanager, ExitStack
 from datetime import datetime
 
+from pool import get_pool, borrow, close_stale_pool, pool_label, statement_cache, PoolTimeoutError
+import prepared
+import replicas
+import schema_cache
+import result_cache
+from result_store import should_spill
+from catalog import load_catalog
+from settings import get_setting
+from compaction import compact_dataframe
+from query_log import log_query
+
 # Constante para armazenar configurações de conexão
 CONN_CONFIG_FILE = "connections.json"
 
@@ -40,13 +57,15 @@ def test_connection(db_type, host, port, database, username, password):
 
 def create_connection(db_type, host, port, database, username, password):
     """Cria uma conexão com o banco de dados"""
+    connect_timeout = int(get_setting("database", "default_timeout", 30))
     if db_type == "PostgreSQL":
         return psycopg2.connect(
             host=host,
             port=port,
             database=database,
             user=username,
-            password=password
+            password=password,
+            connect_timeout=connect_timeout
         )
     elif db_type == "MySQL":
         return pymysql.connect(
@@ -54,17 +73,162 @@ def create_connection(db_type, host, port, database, username, password):
             port=int(port),
             database=database,
             user=username,
-            password=password
+            password=password,
+            connect_timeout=connect_timeout
         )
     elif db_type == "SQL Server":
         conn_str = f'DRIVER={{SQL Server}};SERVER={host},{port};DATABASE={database};UID={username};PWD={password}'
-        return pyodbc.connect(conn_str)
+        return pyodbc.connect(conn_str, timeout=connect_timeout)
     elif db_type == "Oracle":
         dsn = cx_Oracle.makedsn(host, port, service_name=database)
         return cx_Oracle.connect(username, password, dsn)
     else:
         raise ValueError(f"Tipo de banco de dados não suportado: {db_type}")
 
+def _apply_timeout(conn, db_type, timeout):
+    """Aplica o tempo limite de execução de consultas na conexão emprestada"""
+    if not timeout:
+        return
+
+    if db_type == "PostgreSQL":
+        # SET LOCAL vale só para a transação atual, desfeita ao devolver a conexão ao pool
+        cursor = conn.cursor()
+        cursor.execute("SET LOCAL statement_timeout = %s", (int(timeout * 1000),))
+        cursor.close()
+    elif db_type == "MySQL":
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SET SESSION max_execution_time = %s", (int(timeout * 1000),))
+        except pymysql.MySQLError:
+            # Servidores sem max_execution_time (ex.: MariaDB) seguem sem limite
+            pass
+        finally:
+            cursor.close()
+    elif db_type == "SQL Server":
+        conn.timeout = int(timeout)
+    elif db_type == "Oracle":
+        conn.callTimeout = int(timeout * 1000)
+
+@contextmanager
+def get_connection(db_info, timeout=None):
+    """Empresta uma conexão do pool associado a db_info
+
+    `timeout` (em segundos) limita a duração de cada consulta executada na
+    conexão; por padrão usa database.default_timeout do config.yaml.
+    """
+    pool = get_pool(db_info, lambda: create_connection(
+        db_info["type"],
+        db_info["host"],
+        db_info["port"],
+        db_info["database"],
+        db_info["username"],
+        db_info["password"]
+    ))
+    if timeout is None:
+        timeout = get_setting("database", "default_timeout", 30)
+
+    with borrow(pool) as conn:
+        _apply_timeout(conn, db_info["type"], timeout)
+        yield conn
+
+@contextmanager
+def get_read_connection(db_info, timeout=None):
+    """Empresta uma conexão para uma consulta somente leitura
+
+    Com réplicas configuradas (db_info["replicas"]), a conexão vem da réplica
+    escolhida pelo balanceamento; se ela não responder, as demais réplicas e
+    por fim o primário são tentados. Produz (db_info efetivo, conexão).
+    """
+    error = None
+    with ExitStack() as stack:
+        for target in replicas.read_targets(db_info):
+            try:
+                conn = stack.enter_context(get_connection(target, timeout=timeout))
+                break
+            except PoolTimeoutError as e:
+                # Réplica ocupada, mas saudável: tentar a próxima sem afastá-la
+                error = e
+            except Exception as e:
+                replicas.record_failure(db_info, target)
+                error = e
+        else:
+            raise error
+        yield target, conn
+
+@contextmanager
+def _primary_connection(db_info, timeout=None):
+    """Como get_read_connection, mas sempre no primário"""
+    with get_connection(db_info, timeout=timeout) as conn:
+        yield db_info, conn
+
+def _kill_mysql_query(db_info, conn):
+    """Interrompe a instrução em execução na conexão (o MySQL só faz isso a partir de outra conexão)"""
+    killer = create_connection(
+        db_info["type"],
+        db_info["host"],
+        db_info["port"],
+        db_info["database"],
+        db_info["username"],
+        db_info["password"]
+    )
+    try:
+        killer.cursor().execute("KILL QUERY %s", (conn.thread_id(),))
+    finally:
+        killer.close()
+
+class QueryCancelled(Exception):
+    """A consulta foi cancelada pelo usuário"""
+
+class CancelHandle:
+    """Permite cancelar, a partir de outra thread, uma consulta em execução"""
+
+    def __init__(self):
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._conn = None
+        self._cursor = None
+        self._db_info = None
+
+    def _attach(self, conn, cursor, db_info):
+        """Associa a conexão/cursor em uso; falha se já houve cancelamento"""
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled("Consulta cancelada pelo usuário")
+            self._conn, self._cursor, self._db_info = conn, cursor, db_info
+
+    def _detach(self):
+        with self._lock:
+            self._conn = self._cursor = self._db_info = None
+
+    def cancel(self):
+        """Cancela a instrução em execução no servidor"""
+        with self._lock:
+            self.cancelled = True
+            conn, cursor, db_info = self._conn, self._cursor, self._db_info
+
+        if conn is None:
+            return
+
+        try:
+            if db_info["type"] in ("PostgreSQL", "Oracle"):
+                conn.cancel()
+            elif db_info["type"] == "SQL Server":
+                cursor.cancel()
+            elif db_info["type"] == "MySQL":
+                _kill_mysql_query(db_info, conn)
+        except Exception:
+            pass
+
+def close_stale_pools(db_info):
+    """Fecha os pools do primário e das réplicas abertos com outras credenciais
+
+    Chamado quando a conexão é (re)informada: o pool é identificado sem a
+    senha e continuaria usando (ou falhando com) a anterior.
+    """
+    close_stale_pool(db_info)
+    for replica in db_info.get("replicas") or []:
+        close_stale_pool({**db_info, **replica})
+
 def connect_database(db_info, name=None):
     """Conecta ao banco de dados e salva a configuração"""
     # Extrair informações
@@ -74,9 +238,12 @@ def connect_database(db_info, name=None):
     database = db_info["database"]
     username = db_info["username"]
     password = db_info["password"]
+    replica_list = db_info.get("replicas") or []
     
     # Testar conexão
     if test_connection(db_type, host, port, database, username, password):
+        close_stale_pools(db_info)
+        
         # Salvar configuração se tiver um nome
         if name:
             connections = _get_connections()
@@ -88,6 +255,7 @@ def connect_database(db_info, name=None):
                 "database": database,
                 "username": username,
                 "password": password,  # Em uma implementação real, isto seria criptografado
+                "replicas": replica_list,
                 "created_at": datetime.now().isoformat()
             }
             
@@ -97,116 +265,360 @@ def connect_database(db_info, name=None):
     else:
         return False
 
-def execute_query(query, db_info):
-    """Executa uma consulta SQL e retorna os resultados como DataFrame"""
-    try:
-        # Criar conexão
-        conn = create_connection(
-            db_info["type"],
-            db_info["host"],
-            db_info["port"],
-            db_info["database"],
-            db_info["username"],
-            db_info["password"]
-        )
-        
-        # Executar consulta
-        df = pd.read_sql_query(query, conn)
-        
-        # Fechar conexão
-        conn.close()
-        
-        # Registrar a consulta no histórico
-        _log_query(query)
-        
-        return df
-    
-    except Exception as e:
-        st.error(f"Erro ao executar consulta: {str(e)}")
-        return pd.DataFrame()
+def _open_stream_cursor(conn, db_type, fetch_size):
+    """Abre um cursor que busca as linhas sob demanda (do lado do servidor)"""
+    if db_type == "PostgreSQL":
+        cursor = conn.cursor(name=f"neoquery_{uuid.uuid4().hex}")
+        cursor.itersize = fetch_size
+        return cursor
+    if db_type == "MySQL":
+        return conn.cursor(pymysql.cursors.SSCursor)
+
+    # pyodbc e cx_Oracle já buscam as linhas em lotes a cada fetchmany
+    cursor = conn.cursor()
+    if db_type == "Oracle":
+        cursor.arraysize = fetch_size
+    return cursor
+
+# Tipos do PostgreSQL (OIDs) convertidos diretamente na leitura via COPY
+PG_INTEGER_TYPES = {20, 21, 23}
+PG_FLOAT_TYPES = {700, 701, 1700}
+PG_BOOLEAN_TYPES = {16}
+PG_DATE_TYPES = {1082, 1114, 1184}
+
+def _pg_column_types(description):
+    """Mapeia os tipos das colunas do PostgreSQL para tipos do pandas"""
+    dtypes = {}
+    dates = []
+    booleans = []
+    for column in description:
+        if column.type_code in PG_INTEGER_TYPES:
+            dtypes[column.name] = "Int64"
+        elif column.type_code in PG_FLOAT_TYPES:
+            dtypes[column.name] = "float64"
+        elif column.type_code in PG_DATE_TYPES:
+            dates.append(column.name)
+        elif column.type_code in PG_BOOLEAN_TYPES:
+            dtypes[column.name] = "object"
+            booleans.append(column.name)
+        else:
+            dtypes[column.name] = "object"
+    return dtypes, dates, booleans
+
+class QueryStream:
+    """Resultado de uma consulta entregue em blocos de DataFrame
+
+    Itere sobre o objeto para receber os blocos à medida que chegam do banco.
+    Ao final, `rows` indica quantas linhas foram lidas e `truncated` se o
+    limite `max_rows` interrompeu a leitura. Com `use_cache`, um resultado
+    já em cache é entregue em um único bloco (`from_cache`); `refresh`
+    ignora o cache e o atualiza com o novo resultado. Com `fast_path`, no
+    PostgreSQL o resultado é lido via COPY em um único bloco. Com
+    `read_only`, a consulta pode ser atendida por uma réplica de leitura.
+    Com `params`, `query` é um SQL com marcadores `:nome` executado como
+    instrução preparada (ver prepared.py). Depois da leitura completa,
+    `result` é o DataFrame compactado, o mesmo guardado no cache (sem cópia),
+    e `memory_report` traz a memória antes e depois da compactação.
+    """
+
+    def __init__(self, query, db_info, chunk_size=None, max_rows=None, use_cache=True, refresh=False,
+                 timeout=None, cancel_handle=None, fast_path=False, read_only=False, params=None):
+        self.template = query if params is not None else None
+        self.params = params
+        # Cache e log usam o SQL com os valores, igual ao da consulta original
+        self.query = prepared.render_sql(query, params) if params is not None else query
+        self.db_info = db_info
+        self.read_only = read_only
+        self.timeout = timeout
+        self.cancel_handle = cancel_handle
+        self.fast_path = fast_path and db_info["type"] == "PostgreSQL" and params is None
+        self.chunk_size = chunk_size or get_setting("database", "fetch_size", 2000)
+        self.max_rows = max_rows if max_rows is not None else get_setting("database", "max_rows_return", 10000)
+        self.use_cache = use_cache
+        self.refresh = refresh
+        self.columns = []
+        self.rows = 0
+        self.truncated = False
+        self.from_cache = False
+        self.error = None
+        self.result = None
+        self.memory_report = None
+
+    def __iter__(self):
+        if self.use_cache and not self.refresh:
+            cached = result_cache.get_result(self.query, self.db_info)
+            if cached is not None:
+                self.from_cache = True
+                self.columns = list(cached.columns)
+                self.rows = len(cached)
+                self.truncated = cached.attrs.get("truncated", False)
+                size = result_cache.dataframe_bytes(cached)
+                self.result = cached
+                self.memory_report = {"before": size, "after": size, "columns": {}}
+                yield cached
+                return
+
+        chunks = []
+        started = time.monotonic()
+        target = self.db_info
+        try:
+            if self.read_only:
+                connection = get_read_connection(self.db_info, timeout=self.timeout)
+            else:
+                connection = _primary_connection(self.db_info, timeout=self.timeout)
+            with connection as (target, conn):
+                if self.fast_path or (self.params is not None and self.db_info["type"] == "PostgreSQL"):
+                    # EXECUTE de instrução preparada não pode ser aberto como cursor nomeado
+                    cursor = conn.cursor()
+                else:
+                    cursor = _open_stream_cursor(conn, self.db_info["type"], self.chunk_size)
+                try:
+                    if self.cancel_handle:
+                        self.cancel_handle._attach(conn, cursor, target)
+                    if self.fast_path:
+                        reader = self._read_copy(cursor)
+                    elif self.params is not None:
+                        prepared.execute_prepared(
+                            cursor, self.db_info["type"], self.template, self.params,
+                            statements=statement_cache(target, conn)
+                        )
+                        reader = self._read_chunks(cursor)
+                    else:
+                        cursor.execute(self.query)
+                        reader = self._read_chunks(cursor)
+                    first_chunk = True
+                    for chunk in reader:
+                        if first_chunk:
+                            # Latência até o primeiro bloco, usada no balanceamento das réplicas
+                            replicas.record_success(self.db_info, target, time.monotonic() - started)
+                            first_chunk = False
+                        chunks.append(chunk)
+                        yield chunk
+                finally:
+                    if self.cancel_handle:
+                        self.cancel_handle._detach()
+                    if self.truncated and self.db_info["type"] == "MySQL":
+                        self._close_truncated_mysql(target, conn, cursor)
+                    else:
+                        cursor.close()
+
+            # Registrar a consulta no histórico
+            _log_query(self.query, target, self.rows, time.monotonic() - started)
+
+            self._finish(chunks)
+
+        except Exception as e:
+            if self.cancel_handle and self.cancel_handle.cancelled:
+                self.error = "Consulta cancelada pelo usuário"
+                status = "cancelled"
+                st.warning(self.error)
+            else:
+                self.error = str(e)
+                status = "error"
+                st.error(f"Erro ao executar consulta: {str(e)}")
+            _log_query(self.query, target, self.rows, time.monotonic() - started, status=status)
+
+    def _read_chunks(self, cursor):
+        while True:
+            size = self.chunk_size
+            if self.max_rows:
+                size = min(size, self.max_rows - self.rows)
+                if size <= 0:
+                    # Limite atingido: verificar se ainda havia linhas
+                    self.truncated = bool(cursor.fetchmany(1))
+                    return
+
+            rows = cursor.fetchmany(size)
+            if not self.columns and cursor.description:
+                self.columns = [col[0] for col in cursor.description]
+            if not rows:
+                return
+
+            self.rows += len(rows)
+            yield pd.DataFrame.from_records(rows, columns=self.columns, coerce_float=True)
+
+    def _close_truncated_mysql(self, target, conn, cursor):
+        """Fecha o SSCursor de um resultado cortado sem transferir as linhas restantes
+
+        SSCursor.close() lê e descarta o restante do resultado; a instrução é
+        interrompida no servidor antes. Se a conexão ficar inutilizável, o
+        rollback da devolução falha e o pool a descarta.
+        """
+        try:
+            _kill_mysql_query(target, conn)
+        except Exception:
+            pass
+        try:
+            cursor.close()
+        except pymysql.MySQLError:
+            # "Query execution was interrupted": esperado após o KILL QUERY
+            pass
+
+    def _read_copy(self, cursor):
+        """Lê o resultado com COPY ... TO STDOUT e converte direto em colunas tipadas"""
+        inner = self.query.strip().rstrip(";")
+        limited = f"SELECT * FROM ({inner}) AS neoquery_q"
+        if self.max_rows:
+            limited += f" LIMIT {int(self.max_rows) + 1}"
+
+        # Consulta vazia só para descobrir nomes e tipos das colunas
+        cursor.execute(f"SELECT * FROM ({inner}) AS neoquery_q LIMIT 0")
+        self.columns = [col.name for col in cursor.description]
+        if len(set(self.columns)) != len(self.columns):
+            # Nomes de coluna repetidos não podem ser lidos via CSV: usar o cursor
+            self.columns = []
+            cursor.execute(self.query)
+            yield from self._read_chunks(cursor)
+            return
+        dtypes, dates, booleans = _pg_column_types(cursor.description)
+
+        # Arquivo temporário em memória que só vai para o disco se crescer demais
+        with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as buffer:
+            cursor.copy_expert(
+                f"COPY ({limited}) TO STDOUT WITH (FORMAT csv, HEADER false, NULL '\\N')",
+                buffer
+            )
+            buffer.seek(0)
+            df = pd.read_csv(
+                buffer,
+                header=None,
+                names=self.columns,
+                dtype=dtypes,
+                parse_dates=dates,
+                na_values=["\\N"],
+                keep_default_na=False,
+            )
+
+        for column in booleans:
+            df[column] = df[column].map({"t": True, "f": False}).astype("boolean")
+
+        if self.max_rows and len(df) > self.max_rows:
+            df = df.iloc[:self.max_rows]
+            self.truncated = True
+
+        self.rows = len(df)
+        yield df
+
+    def _finish(self, chunks):
+        """Junta e compacta os blocos uma única vez; o mesmo DataFrame vai para o cache"""
+        df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=self.columns)
+        chunks.clear()
+        df.attrs["truncated"] = self.truncated
+        self.result, self.memory_report = compact_dataframe(df)
+        if self.use_cache:
+            self._store(self.result, self.memory_report["after"])
+
+    def _store(self, df, size):
+        """Guarda o resultado completo no cache de resultados"""
+        if size > result_cache.get_cache_stats()["max_bytes"]:
+            return
+        if should_spill(df):
+            # Resultados grandes vão para disco na sessão; mantê-los no cache anularia a economia
+            return
+        result_cache.store_result(self.query, self.db_info, df, size=size)
+
+    def to_dataframe(self):
+        """Consome o restante do stream e retorna o resultado completo"""
+        if self.result is None:
+            for _ in self:
+                pass
+        if self.result is None:
+            return pd.DataFrame(columns=self.columns)
+        return self.result
+
+def execute_query_stream(query, db_info, chunk_size=None, max_rows=None, use_cache=True, refresh=False,
+                         timeout=None, cancel_handle=None, fast_path=False, read_only=False, params=None):
+    """Executa uma consulta SQL e entrega os resultados em blocos de DataFrame"""
+    return QueryStream(query, db_info, chunk_size=chunk_size, max_rows=max_rows,
+                       use_cache=use_cache, refresh=refresh,
+                       timeout=timeout, cancel_handle=cancel_handle, fast_path=fast_path,
+                       read_only=read_only, params=params)
+
+def execute_query(query, db_info, use_cache=True, refresh=False, timeout=None, cancel_handle=None,
+                  fast_path=None, read_only=False, params=None):
+    """Executa uma consulta SQL e retorna os resultados como DataFrame
+
+    Com `params`, `query` deve conter marcadores `:nome` (consultas salvas
+    parametrizadas) e é executada como instrução preparada.
+    """
+    if fast_path is None:
+        fast_path = get_setting("database", "copy_fast_path", True)
+
+    stream = execute_query_stream(query, db_info, use_cache=use_cache, refresh=refresh,
+                                  timeout=timeout, cancel_handle=cancel_handle, fast_path=fast_path,
+                                  read_only=read_only, params=params)
+    df = stream.to_dataframe()
+
+    if stream.truncated:
+        st.warning(f"O resultado foi limitado às primeiras {stream.rows} linhas (database.max_rows_return).")
+
+    return df
+
+def get_schema_info(db_info, refresh=False):
+    """Obtém informações sobre o schema do banco de dados (com cache)"""
+    def load():
+        with get_connection(db_info) as conn:
+            return load_catalog(conn, db_info)
+
+    def probe():
+        with get_connection(db_info) as conn:
+            return _schema_fingerprint(conn, db_info)
 
-def get_schema_info(db_info):
-    """Obtém informações sobre o schema do banco de dados"""
     try:
-        # Criar conexão
-        conn = create_connection(
-            db_info["type"],
-            db_info["host"],
-            db_info["port"],
-            db_info["database"],
-            db_info["username"],
-            db_info["password"]
-        )
-        
-        cursor = conn.cursor()
-        
-        schema_info = {
-            "tables": [],
-            "relationships": []
-        }
-        
-        # Obter lista de tabelas
-        if db_info["type"] == "PostgreSQL":
-            cursor.execute("""
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = 'public'
-            """)
-            tables = [row[0] for row in cursor.fetchall()]
-            
-            # Para cada tabela, obter as colunas
-            for table in tables:
-                cursor.execute(f"""
-                    SELECT column_name, data_type
-                    FROM information_schema.columns
-                    WHERE table_schema = 'public' AND table_name = '{table}'
-                """)
-                
-                columns = [{"name": row[0], "type": row[1]} for row in cursor.fetchall()]
-                
-                schema_info["tables"].append({
-                    "name": table,
-                    "columns": columns
-                })
-                
-            # Obter chaves estrangeiras para relações
-            cursor.execute("""
-                SELECT
-                    tc.table_name, 
-                    kcu.column_name, 
-                    ccu.table_name AS foreign_table_name,
-                    ccu.column_name AS foreign_column_name 
-                FROM 
-                    information_schema.table_constraints AS tc 
-                    JOIN information_schema.key_column_usage AS kcu
-                      ON tc.constraint_name = kcu.constraint_name
-                    JOIN information_schema.constraint_column_usage AS ccu 
-                      ON ccu.constraint_name = tc.constraint_name
-                WHERE constraint_type = 'FOREIGN KEY'
-            """)
-            
-            for row in cursor.fetchall():
-                schema_info["relationships"].append({
-                    "table": row[0],
-                    "column": row[1],
-                    "foreign_table": row[2],
-                    "foreign_column": row[3]
-                })
-        
-        # Implementações similares para outros bancos de dados
-        
-        conn.close()
-        return schema_info
+        return schema_cache.get_schema(db_info, load, probe, refresh=refresh)
     
     except Exception as e:
         st.error(f"Erro ao obter schema: {str(e)}")
         return None
 
-def _log_query(query):
-    """Registra a consulta no log de consultas"""
-    # Em uma implementação real, isso seria feito em um banco de dados
-    
-    # Para esta demonstração, apenas registra em um arquivo
-    with open("query_log.txt", "a") as f:
-        timestamp = datetime.now().isoformat()
-        f.write(f"[{timestamp}] {query}\n")
+def invalidate_schema(db_info=None):
+    """Descarta o schema em cache de uma conexão (ou de todas)"""
+    schema_cache.invalidate(db_info)
+
+# Consultas baratas que resumem o catálogo (contagem de colunas + marcador de alteração)
+FINGERPRINT_QUERIES = {
+    "PostgreSQL": """
+        SELECT count(*), coalesce(sum(hashtext(c.oid::text || a.attname || a.atttypid::text)), 0)
+        FROM pg_catalog.pg_attribute a
+        JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'v', 'm', 'p', 'f')
+          AND a.attnum > 0 AND NOT a.attisdropped
+          AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+          AND n.nspname NOT LIKE 'pg_toast%'
+    """,
+    "MySQL": """
+        SELECT COUNT(*), SUM(CRC32(CONCAT(TABLE_NAME, '.', COLUMN_NAME, ':', COLUMN_TYPE))),
+               (SELECT MAX(CREATE_TIME) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE())
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+    """,
+    "SQL Server": """
+        SELECT COUNT(*), MAX(o.modify_date)
+        FROM sys.columns c
+        JOIN sys.objects o ON o.object_id = c.object_id
+        WHERE o.type IN ('U', 'V') AND o.is_ms_shipped = 0
+    """,
+    "Oracle": """
+        SELECT COUNT(*), MAX(last_ddl_time)
+        FROM user_objects
+        WHERE object_type IN ('TABLE', 'VIEW')
+    """,
+}
+
+def _schema_fingerprint(conn, db_info):
+    """Calcula uma impressão digital do catálogo sem ler o schema completo"""
+    query = FINGERPRINT_QUERIES.get(db_info["type"])
+    if not query:
+        return None
+
+    cursor = conn.cursor()
+    cursor.execute(query)
+    row = cursor.fetchone()
+    cursor.close()
+    return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()
+
+def _log_query(query, db_info=None, rows=None, elapsed=None, status="ok"):
+    """Registra a consulta no log de consultas (gravação em segundo plano)"""
+    connection = pool_label(db_info) if db_info else None
+    log_query(query, connection=connection, rows=rows, elapsed=elapsed, status=status)
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from pool import pool_label
+from settings import get_setting
+from translation_cache import normalize_question
+
+GOLD_LIST_FILE = "gold_list.json"
+
+# Partição dos exemplos sem conexão registrada (anteriores ao particionamento)
+SHARED_PARTITION = "*"
+
+# Sem vocabulário a ajustar: novos exemplos são vetorizados sem reprocessar os anteriores
+_vectorizer = HashingVectorizer(
+    analyzer="char_wb", ngram_range=(3, 5), n_features=2 ** 18, alternate_sign=False, norm="l2"
+)
+
+def _example_key(item):
+    return (item.get("query"), item.get("sql"))
+
+class ExamplePartition:
+    """Exemplos de uma conexão, com índice de vizinhos mais próximos atualizado incrementalmente
+
+    Os exemplos novos ficam em um bloco delta, vetorizados sozinhos e
+    buscados diretamente; só quando o delta atinge
+    nlp_engine.few_shot.merge_size exemplos ele é incorporado ao índice
+    invertido principal. Assim cada inclusão custa o tamanho do delta, não o
+    da partição inteira.
+    """
+
+    def __init__(self):
+        self.examples = []  # exemplos do índice principal seguidos dos do delta
+        self.keys = set()
+        self._pending = []
+        self._matrix = None  # exemplos x n-gramas (índice principal)
+        self._inverted = None  # n-gramas x exemplos (índice invertido do principal)
+        self._delta = None  # exemplos x n-gramas, ainda fora do índice invertido
+
+    def add(self, items):
+        items = [i for i in items if _example_key(i) not in self.keys]
+        for item in items:
+            self.keys.add(_example_key(item))
+        self._pending.extend(items)
+
+    def _flush(self):
+        """Vetoriza apenas os exemplos adicionados desde a última busca"""
+        if not self._pending:
+            return
+        vectors = _vectorizer.transform([normalize_question(i["query"]) for i in self._pending])
+        self._delta = vectors if self._delta is None else sp.vstack([self._delta, vectors], format="csr")
+        self.examples.extend(self._pending)
+        self._pending = []
+        if self._delta.shape[0] >= get_setting("nlp_engine", "few_shot.merge_size", 256):
+            self._merge()
+
+    def _merge(self):
+        """Incorpora o delta ao índice principal, reconstruindo o índice invertido"""
+        self._matrix = self._delta if self._matrix is None else sp.vstack([self._matrix, self._delta], format="csr")
+        self._inverted = self._matrix.T.tocsr()
+        self._delta = None
+
+    def search(self, vector, k):
+        """Busca exata por similaridade de cosseno (vetores já normalizados)"""
+        self._flush()
+        parts = []
+        if self._inverted is not None:
+            # Só as linhas dos n-gramas presentes na pergunta participam do produto
+            parts.append(np.asarray(vector.data @ self._inverted[vector.indices]).ravel())
+        if self._delta is not None:
+            parts.append((self._delta @ vector.T).toarray().ravel())
+        if not parts:
+            return []
+        scores = np.concatenate(parts)
+        k = min(k, len(scores))
+        # argpartition seleciona os k maiores sem ordenar todos os exemplos
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.examples[i]) for i in top if scores[i] > 0]
+
+_partitions = {}
+_signature = None
+_lock = threading.Lock()
+
+def _file_signature():
+    try:
+        stat = os.stat(GOLD_LIST_FILE)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+def _read_gold_list():
+    if not os.path.exists(GOLD_LIST_FILE):
+        return []
+    try:
+        with open(GOLD_LIST_FILE, 'r') as f:
+            return json.load(f)
+    except:
+        return []
+
+def _sync_locked():
+    """Acompanha o arquivo da lista de referência, indexando só os exemplos novos"""
+    global _signature
+    signature = _file_signature()
+    if signature == _signature:
+        return
+
+    gold_list = _read_gold_list()
+    by_partition = {}
+    for item in gold_list:
+        if item.get("query") and item.get("sql"):
+            by_partition.setdefault(item.get("connection") or SHARED_PARTITION, []).append(item)
+
+    current = {name: {_example_key(i) for i in items} for name, items in by_partition.items()}
+    for name, partition in list(_partitions.items()):
+        # Exemplos removidos do arquivo: reconstruir a partição
+        if not partition.keys <= current.get(name, set()):
+            del _partitions[name]
+
+    for name, items in by_partition.items():
+        _partitions.setdefault(name, ExamplePartition()).add(items)
+    _signature = signature
+
+def add_example(question, sql, db_info=None):
+    """Indexa um novo exemplo imediatamente (o arquivo é atualizado por quem o grava)"""
+    name = pool_label(db_info) if db_info else SHARED_PARTITION
+    with _lock:
+        _partitions.setdefault(name, ExamplePartition()).add([{"query": question, "sql": sql}])
+
+def similar_examples(question, db_info=None, k=None):
+    """Os k exemplos mais parecidos com a pergunta, da conexão atual e dos compartilhados
+
+    Retorna uma lista de (similaridade, exemplo), da mais para a menos parecida.
+    """
+    if k is None:
+        k = get_setting("nlp_engine", "few_shot.k", 3)
+    if not k:
+        return []
+
+    vector = _vectorizer.transform([normalize_question(question)])
+    names = [SHARED_PARTITION]
+    if db_info:
+        names.insert(0, pool_label(db_info))
+
+    with _lock:
+        _sync_locked()
+        results = []
+        for name in names:
+            partition = _partitions.get(name)
+            if partition is not None:
+                results.extend(partition.search(vector, k))
+
+    results.sort(key=lambda r: r[0], reverse=True)
+    return results[:k]
@@ -0,0 +1,124 @@
+import threading
+import time
+import atexit
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+from database import execute_query_stream, CancelHandle
+from pool import pool_key
+from settings import get_setting
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Semáforos que limitam as consultas simultâneas por conexão
+_connection_limits = {}
+_limits_lock = threading.Lock()
+
+def _get_executor():
+    """Pool de threads compartilhado pelo processo"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_setting("database", "executor.max_workers", 8),
+                thread_name_prefix="neoquery-query"
+            )
+        return _executor
+
+def _connection_semaphore(db_info):
+    key = pool_key(db_info)
+    with _limits_lock:
+        semaphore = _connection_limits.get(key)
+        if semaphore is None:
+            # Por padrão, não exceder o tamanho do pool de conexões
+            limit = get_setting(
+                "database", "executor.max_per_connection",
+                get_setting("database", "pool.max_size", 5)
+            )
+            semaphore = threading.BoundedSemaphore(limit)
+            _connection_limits[key] = semaphore
+        return semaphore
+
+def _execute(query, db_info, ctx, kwargs, timing):
+    """Executa a consulta em uma thread do pool, respeitando o limite da conexão"""
+    thread = threading.current_thread()
+    # Mensagens do Streamlit (st.error etc.) vão para a sessão que agendou a consulta
+    if ctx is not None:
+        add_script_run_ctx(thread, ctx)
+
+    try:
+        with _connection_semaphore(db_info):
+            # A espera pelo limite da conexão não conta na duração da consulta
+            timing["started"] = time.monotonic()
+            try:
+                stream = execute_query_stream(query, db_info, **kwargs)
+                df = stream.to_dataframe()
+            finally:
+                timing["finished"] = time.monotonic()
+        if stream.error:
+            raise RuntimeError(stream.error)
+        return df
+    finally:
+        if ctx is not None:
+            setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+
+def submit_query(query, db_info, timing=None, **kwargs):
+    """Agenda a execução de uma consulta e retorna um Future com o DataFrame
+
+    Se informado, `timing` recebe os instantes (time.monotonic) em que a
+    consulta começou e terminou de executar ("started" e "finished").
+    """
+    if timing is None:
+        timing = {}
+    return _get_executor().submit(_execute, query, db_info, get_script_run_ctx(), kwargs, timing)
+
+def run_queries(queries, db_info, timeout=None, **kwargs):
+    """Executa várias consultas em paralelo e retorna os resultados na ordem recebida
+
+    Cada item do resultado é um dicionário com `query`, `result` (DataFrame ou
+    None), `error` e `elapsed` (duração da própria consulta, sem a espera por
+    uma vaga na fila ou no limite da conexão). Consultas que não terminam em
+    `timeout` segundos (contados a partir do envio) são canceladas no banco.
+    """
+    if timeout is None:
+        timeout = get_setting("database", "default_timeout", 30)
+
+    started = time.monotonic()
+    handles = [CancelHandle() for _ in queries]
+    timings = [{} for _ in queries]
+    futures = [
+        submit_query(query, db_info, timing=timing, cancel_handle=handle, **kwargs)
+        for query, handle, timing in zip(queries, handles, timings)
+    ]
+
+    results = []
+    for query, future, handle, timing in zip(queries, futures, handles, timings):
+        remaining = max(0, timeout - (time.monotonic() - started)) if timeout else None
+        item = {"query": query, "result": None, "error": None, "elapsed": None}
+        try:
+            item["result"] = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            future.cancel()
+            handle.cancel()
+            item["error"] = f"Tempo limite de {timeout}s excedido"
+        except Exception as e:
+            item["error"] = str(e)
+        # Consulta que não chegou a começar (ex.: cancelada na fila) tem duração zero
+        now = time.monotonic()
+        item["elapsed"] = timing.get("finished", now) - timing.get("started", now)
+        results.append(item)
+
+    return results
+
+def shutdown_executor():
+    """Encerra o pool de threads (chamado ao finalizar o processo)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+atexit.register(shutdown_executor)
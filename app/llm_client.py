@@ -0,0 +1,284 @@
+import atexit
+import importlib.util
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+import httpx
+import openai
+import streamlit as st
+
+from settings import get_setting
+from tokens import count_tokens
+
+# Quantidade de latências recentes usadas nas estatísticas (média e p95)
+LATENCY_WINDOW = 200
+
+class LLMUnavailableError(Exception):
+    """A API do modelo não respondeu após todas as tentativas"""
+
+def _get_api_key():
+    """Chave da OpenAI dos secrets do Streamlit (ou da variável OPENAI_API_KEY)"""
+    try:
+        if "openai" in st.secrets and "api_key" in st.secrets["openai"]:
+            return st.secrets["openai"]["api_key"]
+        if "OPENAI_API_KEY" in st.secrets:
+            return st.secrets["OPENAI_API_KEY"]
+    except Exception:
+        pass
+    return os.environ.get("OPENAI_API_KEY")
+
+def _is_retryable(error):
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+def _retry_after(error):
+    """Tempo de espera sugerido pelo servidor (cabeçalho Retry-After), se houver"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class LLMClient:
+    """Cliente único do processo para a API do modelo
+
+    Mantém um pool HTTP com keep-alive (HTTP/2 quando o pacote h2 estiver
+    instalado), aplica timeouts, repete chamadas com backoff exponencial e
+    jitter em 429/5xx, limita as chamadas simultâneas e registra latência
+    e tokens de cada chamada.
+    """
+
+    def __init__(self, api_key, timeout=30.0, connect_timeout=5.0, max_retries=4,
+                 backoff_base=0.5, backoff_max=20.0, max_concurrency=4, max_keepalive=10,
+                 requests_per_minute=0):
+        self.max_retries = max_retries
+        # Limite de chamadas por minuto (0 = sem limite), abaixo do limite da conta
+        self.requests_per_minute = requests_per_minute
+        self._next_request = 0.0
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.http2 = importlib.util.find_spec("h2") is not None
+
+        self._http = httpx.Client(
+            http2=self.http2,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_concurrency * 2, max_keepalive_connections=max_keepalive),
+        )
+        # As repetições são feitas aqui (com jitter e métricas), não no SDK
+        self._client = openai.OpenAI(api_key=api_key, http_client=self._http, max_retries=0)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._stats = {
+            "calls": 0,
+            "errors": 0,
+            "retries": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def _backoff(self, attempt, error):
+        suggested = _retry_after(error)
+        if suggested is not None:
+            return min(self.backoff_max, suggested)
+        # "Full jitter": espera aleatória até o limite exponencial da tentativa
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _acquire_slot(self):
+        queued = time.monotonic()
+        self._slots.acquire()
+        with self._lock:
+            self._stats["wait_seconds"] += time.monotonic() - queued
+
+    def _pace(self):
+        """Espaça as chamadas para respeitar requests_per_minute"""
+        if not self.requests_per_minute:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_request - now
+            self._next_request = max(now, self._next_request) + 60.0 / self.requests_per_minute
+            if wait > 0:
+                self._stats["wait_seconds"] += wait
+        if wait > 0:
+            time.sleep(wait)
+
+    def _with_retries(self, create, params):
+        """Executa `create(**params)`, repetindo em falhas transitórias"""
+        attempt = 0
+        while True:
+            self._pace()
+            started = time.monotonic()
+            try:
+                return create(**params), started, attempt
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    with self._lock:
+                        self._stats["errors"] += 1
+                    if _is_retryable(e):
+                        raise LLMUnavailableError(str(e)) from e
+                    raise
+                with self._lock:
+                    self._stats["retries"] += 1
+                time.sleep(self._backoff(attempt, e))
+                attempt += 1
+
+    def _call(self, create, params):
+        """Executa `create(**params)` com limite de concorrência e repetições"""
+        self._acquire_slot()
+        try:
+            return self._with_retries(create, params)
+        finally:
+            self._slots.release()
+
+    def _record(self, latency, prompt_tokens, completion_tokens):
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["prompt_tokens"] += prompt_tokens or 0
+            self._stats["completion_tokens"] += completion_tokens or 0
+            self._latencies.append(latency)
+
+    def complete(self, messages, model, **params):
+        """Chamada de chat completa; retorna o texto e as métricas da chamada
+
+        Retorna {"content", "latency", "prompt_tokens", "completion_tokens",
+        "retries"}. Falhas transitórias esgotadas geram LLMUnavailableError.
+        """
+        response, started, retries = self._call(
+            self._client.chat.completions.create,
+            dict(model=model, messages=messages, **params)
+        )
+        latency = time.monotonic() - started
+        usage = response.usage
+        prompt_tokens = usage.prompt_tokens if usage else None
+        completion_tokens = usage.completion_tokens if usage else None
+        self._record(latency, prompt_tokens, completion_tokens)
+
+        return {
+            "content": response.choices[0].message.content or "",
+            "latency": latency,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "retries": retries,
+        }
+
+    def stream(self, messages, model, **params):
+        """Chamada de chat em streaming (ver LLMStream)"""
+        return LLMStream(self, dict(model=model, messages=messages, stream=True, **params))
+
+    def stats(self):
+        """Estatísticas acumuladas das chamadas ao modelo"""
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies)
+        if latencies:
+            stats["latency_avg"] = sum(latencies) / len(latencies)
+            stats["latency_p95"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        stats["http2"] = self.http2
+        return stats
+
+    def close(self):
+        self._http.close()
+
+class LLMStream:
+    """Resposta do modelo entregue em trechos de texto à medida que são gerados
+
+    Itere sobre o objeto para receber os trechos. Ao final, `content` tem o
+    texto completo, `ttft` o tempo até o primeiro trecho e `latency` o tempo
+    total (segundos). Sem uso informado pela API em streaming, os tokens são
+    estimados localmente.
+    """
+
+    def __init__(self, client, params):
+        self._client = client
+        self._params = params
+        self.content = ""
+        self.ttft = None
+        self.latency = None
+        self.retries = 0
+        self.prompt_tokens = None
+        self.completion_tokens = None
+
+    def __iter__(self):
+        client = self._client
+        # O limite de concorrência vale até o fim do streaming
+        client._acquire_slot()
+        try:
+            response, started, self.retries = client._with_retries(
+                client._client.chat.completions.create, self._params
+            )
+            parts = []
+            for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if self.ttft is None:
+                    self.ttft = time.monotonic() - started
+                parts.append(delta)
+                yield delta
+            self.latency = time.monotonic() - started
+            self.content = "".join(parts)
+        finally:
+            client._slots.release()
+
+        self.prompt_tokens = count_tokens(" ".join(m["content"] for m in self._params["messages"]))
+        self.completion_tokens = count_tokens(self.content)
+        client._record(self.latency, self.prompt_tokens, self.completion_tokens)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_llm_client():
+    """Retorna o cliente do modelo do processo, criando-o na primeira chamada"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            api_key = _get_api_key()
+            if not api_key:
+                raise ValueError("Chave API OpenAI não encontrada nos secrets do Streamlit. "
+                                 "Por favor, configure a chave API em .streamlit/secrets.toml ou nas configurações do Streamlit Cloud.")
+            _client = LLMClient(
+                api_key,
+                timeout=get_setting("nlp_engine", "client.timeout", 30.0),
+                connect_timeout=get_setting("nlp_engine", "client.connect_timeout", 5.0),
+                max_retries=get_setting("nlp_engine", "client.max_retries", 4),
+                backoff_base=get_setting("nlp_engine", "client.backoff_base", 0.5),
+                backoff_max=get_setting("nlp_engine", "client.backoff_max", 20.0),
+                max_concurrency=get_setting("nlp_engine", "client.max_concurrency", 4),
+                max_keepalive=get_setting("nlp_engine", "client.max_keepalive", 10),
+                requests_per_minute=get_setting("nlp_engine", "client.requests_per_minute", 0),
+            )
+        return _client
+
+def get_llm_stats():
+    """Estatísticas do cliente do modelo (vazio se ainda não foi criado)"""
+    return _client.stats() if _client is not None else {}
+
+def diagnostics_info():
+    """Versões e caminhos das bibliotecas, para o modo de diagnóstico"""
+    api_key = _get_api_key()
+    return {
+        "python": sys.version,
+        "openai": f"{openai.__version__} ({openai.__file__})",
+        "httpx": f"{httpx.__version__} ({httpx.__file__})",
+        "http2": importlib.util.find_spec("h2") is not None,
+        "api_key": f"{api_key[:5]}...{api_key[-5:]}" if api_key and len(api_key) > 10 else "não encontrada",
+        "stats": get_llm_stats(),
+    }
+
+def _shutdown():
+    if _client is not None:
+        _client.close()
+
+atexit.register(_shutdown)
@@ -5,13 +5,27 @@ import plotly.graph_objects as go
 import os
 import yaml
 import base64
+import math
+import queue
+import threading
+from streamlit.runtime.scriptrunner import add_script_run_ctx
 
 # Importação dos módulos do sistema
-from auth import authenticate_user, create_user, is_authenticated
-from database import connect_database, execute_query, test_connection
-from nlp_engine import natural_to_sql, validate_query, improve_model
+from auth import authenticate_user, create_user, is_authenticated, get_user_details
+from database import (
+    connect_database, execute_query, execute_query_stream, test_connection, close_stale_pools, CancelHandle
+)
+from prepared import parameterize_sql, coerce_value, render_sql
+from nlp_engine import translate_question, validate_query, improve_model
 from visualizations import create_visualization, export_visualization
-from utils import save_query, get_history, add_to_gold_list, get_gold_list
+from utils import save_query, get_history, add_to_gold_list, get_gold_list, get_saved_queries
+from executor import run_queries
+from cost_guard import check_query_cost, prefetch_estimate
+from sql_rewrite import preview_sql
+from result_store import ResultStore, cleanup_stale_spills, should_spill
+from replicas import parse_replicas
+from pool import pool_label, get_pool_stats
+from settings import get_setting
 # Importar componentes UI customizados
 from ui_components import (
     load_css, card, metric_card, styled_table, 
@@ -58,6 +72,183 @@ def display_logo():
         </div>
         """, unsafe_allow_html=True)
 
+# Consome um stream de resultados em uma thread separada
+def iter_in_background(stream, on_wait=None, poll_interval=0.25):
+    """Itera sobre o stream em segundo plano, chamando on_wait enquanto aguarda
+
+    Assim o script do Streamlit não fica bloqueado dentro do driver do banco e
+    pode ser interrompido (ex.: pelo botão "Cancelar") durante a execução.
+    """
+    items = queue.Queue()
+    done = object()
+
+    def worker():
+        try:
+            for chunk in stream:
+                items.put(chunk)
+        finally:
+            items.put(done)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    add_script_run_ctx(thread)
+    thread.start()
+
+    while True:
+        try:
+            item = items.get(timeout=poll_interval)
+        except queue.Empty:
+            if on_wait:
+                on_wait()
+            continue
+        if item is done:
+            break
+        yield item
+
+def cancel_running_query():
+    """Cancela a consulta em execução na sessão atual"""
+    st.session_state.query_cancelled = True
+    handle = st.session_state.get("cancel_handle")
+    if handle:
+        handle.cancel()
+
+def request_full_query(query, sql):
+    """Agenda a execução completa de uma consulta exibida em prévia"""
+    st.session_state.full_query_request = {"query": query, "sql": sql}
+
+def request_regeneration(query):
+    """Agenda uma nova geração do SQL pelo modelo, ignorando os caches de tradução"""
+    st.session_state.regenerate_request = query
+
+def save_current_query(query, sql, user_email, db_info=None):
+    """Salva a consulta exibida, com nome, para reexecução em Consultas Salvas"""
+    save_query(query, sql, user_email, name=query, db_info=db_info)
+    st.session_state.query_saved = True
+
+def send_positive_feedback(query, sql, user_email, db_info):
+    """Registra o feedback positivo e adiciona a consulta à lista de referência"""
+    add_to_gold_list(query, sql, user_email, db_info=db_info)
+    improve_model(query, sql, feedback="positive", db_info=db_info)
+    st.session_state.feedback_message = "Obrigado pelo feedback! Esta consulta foi adicionada à lista de referência."
+
+def send_negative_feedback(query, sql, db_info):
+    """Registra o feedback negativo (a tradução sai do cache) e pede detalhes"""
+    improve_model(query, sql, feedback="negative", db_info=db_info)
+    st.session_state.feedback_details_request = {"query": query, "sql": sql}
+
+def send_feedback_details(query, sql):
+    """Registra o comentário enviado após um feedback negativo"""
+    details = st.session_state.get("feedback_text")
+    if details:
+        improve_model(query, sql, feedback="comment", details=details)
+    st.session_state.feedback_message = "Obrigado pelo feedback! Vamos trabalhar para melhorar."
+
+def request_dashboard_panels():
+    """Agenda a execução dos painéis do dashboard"""
+    st.session_state.dashboard_request = True
+
+def render_dashboard_panels(db_info, user_email):
+    """Executa como painéis as consultas salvas para a conexão atual
+
+    Cada consulta passa pela mesma validação e controle de custo das
+    consultas geradas antes de ir ao banco.
+    """
+    st.markdown("## Dashboard")
+    connection = pool_label(db_info)
+    saved = [q for q in get_saved_queries(user_email) if q.get("connection") == connection][:4]
+    if not saved:
+        st.info("Salve consultas com um nome nesta conexão para vê-las aqui como painéis do seu dashboard.")
+        return
+    
+    plan = (get_user_details(user_email) or {}).get("plan")
+    checked = []
+    for saved_query in saved:
+        sql, error = saved_query["sql_text"], None
+        is_valid, message = validate_query(sql, db_info)
+        if not is_valid:
+            error = message
+        else:
+            cost_check = check_query_cost(sql, db_info, plan=plan)
+            if cost_check["action"] == "block":
+                error = cost_check["message"]
+            else:
+                sql = cost_check["sql"]
+        checked.append((saved_query, sql, error))
+    
+    # Os painéis são consultas independentes: executar em paralelo
+    runnable = [sql for _, sql, error in checked if not error]
+    results = iter(run_queries(runnable, db_info, read_only=True)) if runnable else iter(())
+    panel_cols = st.columns(2)
+    
+    for i, (saved_query, sql, error) in enumerate(checked):
+        with panel_cols[i % 2]:
+            st.markdown(f"**{saved_query['name']}**")
+            panel = {"error": error} if error else next(results)
+            if panel["error"]:
+                st.error(panel["error"])
+            else:
+                st.dataframe(panel["result"], use_container_width=True, height=200)
+                st.caption(f"{len(panel['result'])} linhas em {panel['elapsed']:.2f}s")
+
+PAGE_WIDGET_KEYS = ("page_columns", "page_sort", "page_order", "page_number")
+
+def build_executed_sql(sql_query, preview_mode, db_type):
+    """SQL efetivamente executado: a consulta completa ou sua prévia"""
+    if preview_mode == "Completa":
+        return sql_query
+    return preview_sql(
+        sql_query,
+        db_type,
+        get_setting("database", "preview.rows", 200),
+        sample_percent=(
+            get_setting("database", "preview.sample_percent", 1)
+            if preview_mode == "Prévia (amostra da tabela)" else None
+        )
+    )
+
+def get_result_store():
+    """Retorna o armazenamento em disco de resultados da sessão atual"""
+    if "result_store" not in st.session_state:
+        cleanup_stale_spills()
+        st.session_state.result_store = ResultStore()
+    return st.session_state.result_store
+
+def set_paged_result(spilled, query=None):
+    """Define o resultado paginado da sessão, descartando o anterior"""
+    store = get_result_store()
+    previous = st.session_state.pop("paged_result", None)
+    if previous and (spilled is None or previous["id"] != spilled.id):
+        store.discard(previous["id"])
+    for key in PAGE_WIDGET_KEYS:
+        st.session_state.pop(key, None)
+    if spilled is not None:
+        st.session_state.paged_result = {"id": spilled.id, "query": query}
+
+def render_result_pages(spilled):
+    """Exibe um resultado gravado em disco, uma página por vez"""
+    page_size = get_setting("database", "result_store.page_size", 500)
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        columns = st.multiselect("Colunas", spilled.columns, default=spilled.columns, key="page_columns")
+    with col2:
+        sort_by = st.selectbox("Ordenar por", ["(nenhuma)"] + spilled.columns, key="page_sort")
+    with col3:
+        order = st.radio("Ordem", ["Crescente", "Decrescente"], horizontal=True, key="page_order")
+    
+    pages = max(1, math.ceil(spilled.num_rows / page_size))
+    page = st.number_input(f"Página (de {pages})", min_value=1, max_value=pages, value=1, key="page_number")
+    
+    offset = (page - 1) * page_size
+    page_df = spilled.page(
+        offset,
+        page_size,
+        sort_by=None if sort_by == "(nenhuma)" else sort_by,
+        ascending=order == "Crescente",
+        columns=columns or None
+    )
+    st.dataframe(page_df, use_container_width=True)
+    st.caption(f"Linhas {offset + 1 if len(page_df) else 0}–{offset + len(page_df)} de {spilled.num_rows}")
+
 # Função principal para a página inicial
 def main_page():
     display_logo()
@@ -287,6 +478,12 @@ def dashboard_page():
                     username = st.text_input("Usuário")
                     password = st.text_input("Senha", type="password")
                 
+                replicas_text = st.text_input(
+                    "Réplicas de leitura (opcional)",
+                    placeholder="replica1:5432:2, replica2:5432:1",
+                    help="host[:porta][:peso], separados por vírgula. As consultas geradas são distribuídas entre as réplicas."
+                )
+                
                 connect_button = st.form_submit_button("Conectar")
                 
                 if connect_button:
@@ -298,8 +495,11 @@ def dashboard_page():
                             "port": port,
                             "database": database,
                             "username": username,
-                            "password": password
+                            "password": password,
+                            "replicas": parse_replicas(replicas_text)
                         }
+                        # Pools abertos antes com outra senha não podem ser reaproveitados
+                        close_stale_pools(st.session_state.db_info)
                         st.success("Conexão estabelecida com sucesso!")
                         st.experimental_rerun()
                     else:
@@ -318,28 +518,176 @@ def dashboard_page():
             col1, col2 = st.columns([4, 1])
             
             with col1:
-                pass
+                refresh_results = st.checkbox(
+                    "Ignorar cache de resultados",
+                    help="Executa a consulta novamente no banco, mesmo que o resultado esteja em cache"
+                )
+                preview_mode = st.radio(
+                    "Execução",
+                    ["Completa", "Prévia (primeiras linhas)", "Prévia (amostra da tabela)"],
+                    horizontal=True,
+                    help="A prévia limita o resultado para respostas imediatas; a consulta completa pode ser executada em seguida"
+                )
             
             with col2:
                 query_button = st.button("Consultar", type="primary", use_container_width=True)
+                st.button(
+                    "Painéis",
+                    key="dashboard_panels",
+                    on_click=request_dashboard_panels,
+                    use_container_width=True,
+                    help="Executa as consultas salvas desta conexão como painéis"
+                )
+            
+            if st.session_state.pop("query_saved", False):
+                st.success("Consulta salva com sucesso! Reexecute-a com outros valores em \"Consultas Salvas\".")
+            
+            if st.session_state.get("query_cancelled"):
+                st.session_state.query_cancelled = False
+                st.info("A consulta anterior foi cancelada.")
+            
+            # Retorno dos botões de feedback da consulta anterior
+            feedback_message = st.session_state.pop("feedback_message", None)
+            if feedback_message:
+                st.success(feedback_message)
+            
+            feedback_details_request = st.session_state.pop("feedback_details_request", None)
+            if feedback_details_request:
+                with st.form("feedback_details_form"):
+                    st.text_area("Como podemos melhorar?", key="feedback_text")
+                    st.form_submit_button(
+                        "Enviar feedback",
+                        on_click=send_feedback_details,
+                        args=(feedback_details_request["query"], feedback_details_request["sql"])
+                    )
+            
+            # Painéis executados apenas quando solicitados
+            if st.session_state.pop("dashboard_request", False):
+                render_dashboard_panels(st.session_state.db_info, st.session_state.user_email)
+            
+            # Execução completa solicitada a partir de uma prévia
+            full_query_request = st.session_state.pop("full_query_request", None)
+            if full_query_request:
+                query = full_query_request["query"]
+                preview_mode = "Completa"
+            
+            # Nova geração solicitada quando a resposta veio de um cache
+            regenerate_request = st.session_state.pop("regenerate_request", None)
+            if regenerate_request:
+                query = regenerate_request
             
-            if query_button and query:
+            if (query_button and query) or full_query_request or regenerate_request:
                 with st.spinner("Processando sua consulta..."):
-                    # Converter linguagem natural para SQL
-                    sql_query = natural_to_sql(query, st.session_state.db_info)
+                    # Estimativa de custo iniciada enquanto o modelo ainda gera a resposta
+                    prefetched = {}
+                    
+                    if full_query_request:
+                        # Reaproveitar o SQL já gerado, sem nova chamada ao modelo
+                        sql_query = full_query_request["sql"]
+                    else:
+                        stream_callbacks = {}
+                        if get_setting("nlp_engine", "streaming", True):
+                            sql_placeholder = st.empty()
+                            
+                            def show_partial_sql(text):
+                                sql_placeholder.code(text, language="sql")
+                            
+                            def on_statement_complete(sql):
+                                # Validar e pedir o EXPLAIN sem esperar o fim da geração
+                                if validate_query(sql, st.session_state.db_info)[0]:
+                                    executed = build_executed_sql(sql, preview_mode, st.session_state.db_info["type"])
+                                    prefetched[executed] = prefetch_estimate(executed, st.session_state.db_info)
+                            
+                            stream_callbacks = {"on_partial": show_partial_sql, "on_statement": on_statement_complete}
+                        
+                        # Converter linguagem natural para SQL
+                        translation = translate_question(
+                            query,
+                            st.session_state.db_info,
+                            use_cache=not regenerate_request,
+                            **stream_callbacks
+                        )
+                        sql_query = translation["sql"]
+                        if stream_callbacks:
+                            # O SQL completo é exibido na aba "SQL Gerado"
+                            sql_placeholder.empty()
+                        
+                        if translation["source"] == "template" and translation["degraded"]:
+                            st.warning(
+                                "O serviço do modelo está indisponível. O SQL foi gerado localmente a partir de um "
+                                f"modelo de consulta (confiança {translation['score']:.0%}); confira antes de usar."
+                            )
+                        elif translation["source"] in ("cache", "similar", "template"):
+                            if translation["source"] == "cache":
+                                st.caption("SQL recuperado do cache: esta pergunta já foi respondida para este schema.")
+                            elif translation["source"] == "template":
+                                st.caption(
+                                    f"SQL gerado localmente a partir de um modelo de consulta "
+                                    f"(confiança {translation['score']:.0%}), sem chamar o modelo."
+                                )
+                            else:
+                                st.caption(
+                                    f"SQL reaproveitado da pergunta semelhante \"{translation['matched_question']}\" "
+                                    f"(similaridade {translation['score']:.0%})."
+                                )
+                            st.button(
+                                "Gerar novamente",
+                                key="regenerate_sql",
+                                on_click=request_regeneration,
+                                args=(query,),
+                                help="Ignora as respostas reaproveitadas ou geradas localmente e gera um novo SQL com o modelo"
+                            )
+                        elif translation["source"] == "model":
+                            caption = f"SQL gerado pelo modelo em {translation['latency']:.1f}s ({translation['tokens']} tokens)."
+                            if translation.get("ttft") is not None:
+                                caption += f" Primeiro trecho em {translation['ttft']:.2f}s."
+                            report = translation["schema_report"]
+                            if report["tables_after"] < report["tables_before"]:
+                                caption += (
+                                    f" Schema enviado: {report['tables_after']} de {report['tables_before']} tabelas "
+                                    f"(~{report['tokens_before']:,} → ~{report['tokens_after']:,} tokens)."
+                                )
+                            prompt_report = report["prompt"]
+                            if prompt_report["tables_dropped"] or prompt_report["examples_dropped"]:
+                                caption += (
+                                    f" Prompt reduzido ao limite de {prompt_report['budget']:,} tokens: "
+                                    f"{prompt_report['tables_dropped']} tabelas e "
+                                    f"{prompt_report['examples_dropped']} exemplos removidos."
+                                )
+                            st.caption(caption)
                     
                     # Verificar e validar a query gerada
                     is_valid, message = validate_query(sql_query, st.session_state.db_info)
                     
                     if is_valid:
-                        # Executar a consulta
-                        result_df = execute_query(sql_query, st.session_state.db_info)
+                        executed_sql = build_executed_sql(sql_query, preview_mode, st.session_state.db_info["type"])
                         
+                        # Estimativa já em andamento para este SQL: aguardar em vez de repetir o EXPLAIN
+                        if prefetched.get(executed_sql):
+                            prefetched[executed_sql].join()
+                        
+                        # Avaliar o custo estimado (EXPLAIN) antes de executar no banco
+                        user_details = get_user_details(st.session_state.user_email) or {}
+                        cost_check = check_query_cost(executed_sql, st.session_state.db_info, plan=user_details.get("plan"))
+                        if cost_check["action"] == "block":
+                            is_valid, message = False, cost_check["message"]
+                        elif cost_check["action"] == "limit":
+                            if executed_sql == sql_query:
+                                sql_query = cost_check["sql"]
+                            executed_sql = cost_check["sql"]
+                            st.info(cost_check["message"])
+                        elif cost_check["action"] == "warn":
+                            st.warning(cost_check["message"])
+                    
+                    if is_valid:
                         # Exibir tabs para os diferentes tipos de visualização
                         tabs = st.tabs(["SQL Gerado", "Tabela de Resultados", "Gráfico", "Dashboard"])
                         
                         with tabs[0]:
                             st.code(sql_query, language="sql")
+                            if executed_sql != sql_query:
+                                st.caption("SQL executado na prévia:")
+                                st.code(executed_sql, language="sql")
                             st.download_button(
                                 "Baixar SQL", 
                                 sql_query, 
@@ -348,13 +696,92 @@ def dashboard_page():
                             )
                         
                         with tabs[1]:
-                            st.dataframe(result_df, use_container_width=True)
+                            table_placeholder = st.empty()
+                            status_placeholder = st.empty()
+                            cancel_placeholder = st.empty()
+                            
+                            # O botão interrompe o script; o cancelamento é repassado ao banco
+                            cancel_handle = CancelHandle()
+                            st.session_state.cancel_handle = cancel_handle
+                            cancel_placeholder.button("Cancelar", key="cancel_query", on_click=cancel_running_query)
+                            
+                            # Executar a consulta em blocos, exibindo o primeiro bloco assim que chegar
+                            stream = execute_query_stream(
+                                executed_sql,
+                                st.session_state.db_info,
+                                refresh=refresh_results,
+                                cancel_handle=cancel_handle,
+                                read_only=True
+                            )
+                            first_chunk = True
+                            try:
+                                for chunk in iter_in_background(
+                                    stream,
+                                    on_wait=lambda: status_placeholder.caption(f"Executando... {stream.rows} linhas recebidas")
+                                ):
+                                    if first_chunk:
+                                        table_placeholder.dataframe(chunk, use_container_width=True)
+                                        first_chunk = False
+                                    status_placeholder.caption(f"Carregando... {stream.rows} linhas recebidas")
+                            except BaseException:
+                                # Script interrompido (ex.: "Cancelar" ou nova interação): liberar o banco
+                                cancel_handle.cancel()
+                                raise
+                            finally:
+                                st.session_state.cancel_handle = None
+                            cancel_placeholder.empty()
+                            
+                            # Resultado já compactado pelo stream (o mesmo DataFrame guardado no cache)
+                            if stream.result is not None:
+                                result_df, memory_report = stream.result, stream.memory_report
+                            else:
+                                result_df, memory_report = pd.DataFrame(columns=stream.columns), {"before": 0, "after": 0}
+                            
+                            # Resultados grandes vão para disco e são exibidos por página
+                            spilled = None
+                            if should_spill(result_df):
+                                try:
+                                    spilled = get_result_store().spill(result_df)
+                                except ValueError:
+                                    # Ex.: nomes de colunas duplicados; o resultado fica em memória
+                                    spilled = None
+                            if spilled:
+                                max_points = get_setting("visualizations", "max_datapoints", 5000)
+                                result_df = spilled.page(0, max_points)
+                            set_paged_result(spilled, query)
+                            
+                            if spilled:
+                                with table_placeholder.container():
+                                    render_result_pages(spilled)
+                            else:
+                                table_placeholder.dataframe(result_df, use_container_width=True)
+                            
+                            memory_info = (
+                                f"memória: {memory_report['before'] / 1024 / 1024:.1f} MB → "
+                                f"{memory_report['after'] / 1024 / 1024:.1f} MB"
+                            )
+                            if stream.truncated:
+                                status_placeholder.warning(f"Resultado limitado às primeiras {stream.rows} linhas ({memory_info}).")
+                            elif stream.from_cache:
+                                status_placeholder.caption(f"{stream.rows} linhas (resultado em cache, {memory_info})")
+                            else:
+                                status_placeholder.caption(f"{stream.rows} linhas ({memory_info})")
+                            
+                            if executed_sql != sql_query:
+                                st.info("Esta é uma prévia do resultado.")
+                                st.button(
+                                    "Executar consulta completa",
+                                    key="run_full_query",
+                                    on_click=request_full_query,
+                                    args=(query, sql_query)
+                                )
                             
                             col1, col2 = st.columns(2)
                             
                             with col1:
                                 if st.button("Exportar para CSV"):
-                                    csv = result_df.to_csv(index=False)
+                                    export_df = spilled.to_dataframe() if spilled else result_df
+                                    csv = export_df.to_csv(index=False)
                                     st.download_button(
                                         "Baixar CSV",
                                         csv,
@@ -363,11 +790,15 @@ def dashboard_page():
                                     )
                             
                             with col2:
-                                if st.button("Salvar Consulta"):
-                                    save_query(query, sql_query, st.session_state.user_email)
-                                    st.success("Consulta salva com sucesso!")
+                                st.button(
+                                    "Salvar Consulta",
+                                    on_click=save_current_query,
+                                    args=(query, sql_query, st.session_state.user_email, st.session_state.db_info)
+                                )
                         
                         with tabs[2]:
+                            if spilled:
+                                st.caption(f"O gráfico usa as primeiras {len(result_df)} linhas do resultado.")
                             if not result_df.empty:
                                 # Determinar automaticamente o tipo de gráfico adequado
                                 viz_container = st.container()
@@ -407,7 +838,12 @@ def dashboard_page():
                         
                         with tabs[3]:
                             st.markdown("## Dashboard")
-                            st.info("Funcionalidade em desenvolvimento. Em breve você poderá criar dashboards personalizados com suas consultas favoritas!")
+                            st.caption("Os painéis são as consultas salvas para esta conexão.")
+                            st.button(
+                                "Atualizar painéis",
+                                key="dashboard_panels_tab",
+                                on_click=request_dashboard_panels
+                            )
                         
                         # Área de feedback
                         st.markdown("---")
@@ -416,21 +852,33 @@ def dashboard_page():
                         col1, col2, col3 = st.columns([1, 1, 3])
                         
                         with col1:
-                            if st.button("👍 Sim"):
-                                add_to_gold_list(query, sql_query, st.session_state.user_email)
-                                improve_model(query, sql_query, feedback="positive")
-                                st.success("Obrigado pelo feedback! Esta consulta foi adicionada à lista de referência.")
+                            st.button(
+                                "👍 Sim",
+                                key="feedback_positive",
+                                on_click=send_positive_feedback,
+                                args=(query, sql_query, st.session_state.user_email, st.session_state.db_info)
+                            )
                         
                         with col2:
-                            if st.button("👎 Não"):
-                                st.text_area("Como podemos melhorar?", key="feedback_text")
-                                if st.button("Enviar feedback"):
-                                    improve_model(query, sql_query, feedback="negative", details=st.session_state.feedback_text)
-                                    st.success("Obrigado pelo feedback! Vamos trabalhar para melhorar.")
+                            st.button(
+                                "👎 Não",
+                                key="feedback_negative",
+                                on_click=send_negative_feedback,
+                                args=(query, sql_query, st.session_state.db_info)
+                            )
                     
                     else:
                         st.error(f"Erro na consulta gerada: {message}")
             
+            # Navegação entre páginas de um resultado grande (após interação com os controles)
+            elif st.session_state.get("paged_result"):
+                paged = st.session_state.paged_result
+                spilled = get_result_store().get(paged["id"])
+                if spilled:
+                    st.markdown(f"### Resultado: {paged['query']}")
+                    render_result_pages(spilled)
+                    result_df = None
+            
             # Se não houver consulta ativa, mostrar sugestões
             if "result_df" not in locals():
                 st.markdown("### Sugestões de consultas:")
@@ -495,6 +943,15 @@ def dashboard_page():
             with col4:
                 st.button("Gerenciar", key=f"manage_{conn['name']}")
         
+        # Pools de conexão abertos neste processo
+        st.markdown("## Pools de conexão")
+        
+        pool_stats = get_pool_stats()
+        if pool_stats:
+            st.dataframe(pd.DataFrame.from_dict(pool_stats, orient="index"), use_container_width=True)
+        else:
+            st.info("Nenhum pool de conexão aberto.")
+        
         st.markdown("---")
         
         # Formulário para adicionar nova conexão
@@ -570,29 +1027,83 @@ def dashboard_page():
         # Lista de consultas salvas
         st.markdown("## Minhas consultas")
         
-        # Exemplo de consultas salvas para demonstração
-        saved_queries = [
-            {"name": "Vendas por região", "category": "Vendas", "created": "2025-04-25", "starred": True},
-            {"name": "Produtos com estoque crítico", "category": "Estoque", "created": "2025-04-30", "starred": False}
-        ]
+        saved_queries = get_saved_queries(st.session_state.user_email)
+        if categories:
+            saved_queries = [q for q in saved_queries if q["category"] in categories]
         
-        for query in saved_queries:
-            col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
-            
-            with col1:
-                title = query['name']
-                if query['starred']:
-                    title = f"⭐ {title}"
-                st.markdown(f"**{title}**")
-            
-            with col2:
-                st.markdown(query['category'])
+        if not saved_queries:
+            st.info("Nenhuma consulta salva ainda. Use \"Salvar Consulta\" na tabela de resultados.")
+        
+        for saved in saved_queries:
+            title = saved["name"]
+            if saved.get("starred"):
+                title = f"⭐ {title}"
             
-            with col3:
-                st.markdown(query['created'])
+            # Consultas salvas antes da parametrização são convertidas na hora
+            if "sql_template" in saved:
+                template, parameters = saved["sql_template"], saved["parameters"]
+            else:
+                template, parameters = parameterize_sql(saved["sql_text"])
             
-            with col4:
-                st.button("Executar", key=f"run_{query['name']}")
+            with st.expander(f"{title} · {saved['category']} · {saved['created_at'][:10]}"):
+                st.code(template, language="sql")
+                
+                # Reexecução com novos valores: sem chamada ao modelo e com a instrução já preparada no banco
+                with st.form(f"run_saved_{saved['id']}"):
+                    raw_values = {}
+                    param_cols = st.columns(min(len(parameters), 3) or 1)
+                    for i, parameter in enumerate(parameters):
+                        with param_cols[i % len(param_cols)]:
+                            raw_values[parameter["name"]] = st.text_input(
+                                parameter["name"],
+                                value=str(parameter["value"]),
+                                key=f"param_{saved['id']}_{parameter['name']}"
+                            )
+                    run_saved = st.form_submit_button("Executar")
+                
+                if run_saved:
+                    if not st.session_state.get("db_connected"):
+                        st.warning("Conecte um banco de dados no Dashboard para executar a consulta.")
+                    elif saved.get("connection") != pool_label(st.session_state.db_info):
+                        st.warning(
+                            f"Esta consulta foi salva para a conexão {saved.get('connection') or 'não registrada'}; "
+                            "conecte-se a ela no Dashboard para executá-la."
+                        )
+                    else:
+                        try:
+                            values = {
+                                p["name"]: coerce_value(p, raw_values[p["name"]])
+                                for p in parameters
+                            }
+                        except ValueError:
+                            st.error("Informe valores numéricos válidos para os parâmetros numéricos.")
+                        else:
+                            # Mesma validação e controle de custo das consultas geradas
+                            rendered = render_sql(template, values)
+                            db_info = st.session_state.db_info
+                            is_valid, message = validate_query(rendered, db_info)
+                            cost_check = None
+                            if is_valid:
+                                plan = (get_user_details(st.session_state.user_email) or {}).get("plan")
+                                cost_check = check_query_cost(rendered, db_info, plan=plan)
+                                if cost_check["action"] == "block":
+                                    is_valid, message = False, cost_check["message"]
+                            
+                            if not is_valid:
+                                st.error(message)
+                            else:
+                                if cost_check["action"] == "limit":
+                                    st.info(cost_check["message"])
+                                elif cost_check["action"] == "warn":
+                                    st.warning(cost_check["message"])
+                                with st.spinner("Executando consulta..."):
+                                    if cost_check["action"] == "limit":
+                                        # SQL com o limite de linhas aplicado pelo controle de custo
+                                        saved_df = execute_query(cost_check["sql"], db_info, read_only=True)
+                                    else:
+                                        saved_df = execute_query(template, db_info, read_only=True, params=values)
+                                st.caption(cost_check["sql"])
+                                st.dataframe(saved_df, use_container_width=True)
         
         st.markdown("---")
         
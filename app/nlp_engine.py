@@ -4,14 +4,19 @@ import json
 import os
 import re
 import sqlparse
-import openai
 import time
 from datetime import datetime
-# Importações adicionadas para depuração
-import sys
 import traceback
-import httpx
-import inspect
+
+import translation_cache
+from similarity import find_similar
+from schema_pruning import prune_schema, rank_tables
+from prompt_builder import build_messages
+from example_index import add_example, similar_examples
+from pool import pool_label
+from settings import get_setting
+from llm_client import LLMUnavailableError, get_llm_client, diagnostics_info
+from sql_templates import match_template
 
 # Constantes para gerenciar o aprendizado
 GOLD_LIST_FILE = "gold_list.json"
@@ -52,11 +57,64 @@ def _log_feedback(query, sql, feedback, details=None):
     with open(FEEDBACK_FILE, 'w') as f:
         json.dump(feedback_data, f, indent=2)
 
-def natural_to_sql(query, db_info):
+def _model_settings():
+    """Modelo e parâmetros usados na geração (fazem parte da chave do cache de traduções)"""
+    return {"model": "gpt-3.5-turbo", "temperature": 0.2}
+
+def _clean_sql(text):
+    """Remove o bloco de código markdown e formata o SQL"""
+    sql = text.strip().replace("```sql", "").replace("```", "").strip()
+    return sqlparse.format(sql, reindent=True, keyword_case='upper')
+
+def _complete_statement(text):
+    """Primeiro comando completo da resposta parcial, ou None se ainda não terminou
+
+    O comando termina em um ';' fora de strings e identificadores entre
+    aspas, ou no fechamento do bloco de código markdown.
+    """
+    body = re.sub(r'^\s*```(?:sql)?', '', text, flags=re.IGNORECASE)
+    quote = None
+    for i, char in enumerate(body):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"', '`'):
+            if body.startswith("```", i):
+                return body[:i] if body[:i].strip() else None
+            quote = char
+        elif char == ';':
+            return body[:i + 1]
+    return None
+
+def natural_to_sql(query, db_info, use_cache=True):
     """Converte uma consulta em linguagem natural para SQL usando um modelo de NLP"""
+    return translate_question(query, db_info, use_cache=use_cache)["sql"]
+
+def translate_question(query, db_info, use_cache=True, on_partial=None, on_statement=None, schema=None):
+    """Traduz a pergunta para SQL e informa de onde veio a resposta
+
+    Retorna {"sql", "source", "score", "matched_question", "schema_report"}, em que `source`
+    é "cache" (mesma pergunta já traduzida para este schema e modelo),
+    "similar" (pergunta parecida da lista de referência ou do histórico,
+    com a similaridade em `score`), "template" (pergunta simples traduzida
+    localmente, com a confiança em `score`) ou "model". `use_cache=False`
+    ignora os caches e os modelos de consulta e força uma nova geração. Com
+    o serviço do modelo indisponível, um modelo de consulta de confiança
+    menor ainda é usado, com `degraded` verdadeiro. `schema_report` traz o tamanho do
+    schema no prompt antes e depois da seleção de tabelas relevantes; nas
+    respostas do modelo também vêm `latency` (segundos) e `tokens`.
+
+    Com `on_partial` ou `on_statement` a resposta do modelo chega em
+    streaming: `on_partial(texto)` recebe o SQL acumulado a cada trecho e
+    `on_statement(sql)` é chamado uma vez, com o SQL já formatado, assim que
+    o comando estiver completo (antes do fim da geração). O resultado traz
+    então `ttft`, o tempo até o primeiro trecho. `schema` evita consultar o
+    catálogo a cada pergunta quando várias são traduzidas em sequência.
+    """
     # Obter informações do schema do banco de dados
-    from database import get_schema_info
-    schema = get_schema_info(db_info)
+    if schema is None:
+        from database import get_schema_info
+        schema = get_schema_info(db_info)
 
     # Se não conseguiu obter o schema, use um exemplo
     if not schema:
@@ -98,93 +156,135 @@ def natural_to_sql(query, db_info):
             ]
         }
 
-    # Exemplos de consultas bem-sucedidas (Gold List)
-    gold_examples = _get_gold_list()
-    examples_text = ""
-    if gold_examples:
-        examples_text = "Exemplos de consultas bem-sucedidas:\n\n"
-        for example in gold_examples[:3]: # Use apenas os 3 primeiros exemplos
-            examples_text += f"Query: {example['query']}\nSQL: {example['sql']}\n\n"
-
-    # Criar o prompt para o modelo
-    prompt = f"""Você é um especialista em converter perguntas em linguagem natural para SQL.
-Schema do banco de dados:
-{json.dumps(schema, indent=2)}
-
-{examples_text}
-Pergunta do usuário: {query}
-Gere apenas o código SQL que responde à pergunta. Não inclua explicações.
-"""
-    try:
-        # Obter a chave API dos secrets do Streamlit
-        api_key = None
-        try:
-            if "openai" in st.secrets and "api_key" in st.secrets["openai"]:
-                api_key = st.secrets["openai"]["api_key"]
-            elif "OPENAI_API_KEY" in st.secrets:
-                api_key = st.secrets["OPENAI_API_KEY"]
-        except:
-            pass
+    # Mesma pergunta, mesmo schema e mesmo modelo: reaproveitar a tradução
+    fingerprint = translation_cache.schema_fingerprint(schema)
+    model_settings = _model_settings()
+    if use_cache:
+        cached_sql = translation_cache.get_translation(query, db_info, fingerprint, model_settings)
+        if cached_sql:
+            return {"sql": cached_sql, "source": "cache", "score": 1.0, "matched_question": query, "schema_report": None}
 
-        if not api_key:
-            raise ValueError("Chave API OpenAI não encontrada nos secrets do Streamlit. "
-                             "Por favor, configure a chave API em .streamlit/secrets.toml ou nas configurações do Streamlit Cloud.")
+        # Pergunta parecida já respondida (paráfrase): reaproveitar o SQL validado
+        match = find_similar(query, schema, db_info=db_info)
+        if match:
+            return {
+                "sql": match["sql"],
+                "source": "similar",
+                "score": match["score"],
+                "matched_question": match["question"],
+                "schema_report": None,
+            }
 
-        # Bloco de depuração INSERIDO AQUI
-        st.subheader("Informações de Depuração da Inicialização OpenAI e HTTPX")
-        st.write(f"Versão do Python: {sys.version}")
+    # Perguntas simples (top N, totais por período, contagens) dispensam o modelo
+    db_type = db_info.get("type", "PostgreSQL") if db_info else "PostgreSQL"
+    template = match_template(query, schema, db_type)
+    if use_cache and template and template["confidence"] >= get_setting("nlp_engine", "templates.min_confidence", 0.75):
+        return _template_result(template)
 
-        st.write("--- OpenAI Info ---")
-        st.write(f"Caminho da biblioteca OpenAI: {openai.__file__}")
-        st.write(f"Versão da biblioteca OpenAI: {openai.__version__}")
+    # Apenas as tabelas relevantes para a pergunta (e suas vizinhas por FK) vão para o prompt
+    prompt_schema, schema_report = prune_schema(schema, query, fingerprint=fingerprint)
 
-        st.write("--- HTTPX Info ---")
-        st.write(f"Caminho da biblioteca httpx: {httpx.__file__}")
-        st.write(f"Versão da biblioteca httpx: {httpx.__version__}")
-        try:
-            # Tenta obter e mostrar a assinatura do construtor do httpx.Client
-            sig_httpx_client_init = str(inspect.signature(httpx.Client.__init__))
-            st.write(f"Assinatura de httpx.Client.__init__: {sig_httpx_client_init}")
-        except Exception as e_inspect:
-            st.write(f"Não foi possível obter a assinatura de httpx.Client.__init__: {str(e_inspect)}")
+    # Exemplos de consultas bem-sucedidas (Gold List) mais parecidos com a pergunta
+    gold_examples = [example for _, example in similar_examples(query, db_info)]
 
-        api_key_para_mostrar = "Chave API não encontrada ou inválida"
-        if 'api_key' in locals() and api_key and isinstance(api_key, str) and len(api_key) > 10:
-            api_key_para_mostrar = f"{api_key[:5]}...{api_key[-5:]}"
-        elif 'api_key' in locals() and api_key:
-            api_key_para_mostrar = f"Chave API é curta ou não é uma string (Tipo: {type(api_key)})"
-
-        st.write(f"Tipo da variável api_key: {type(api_key) if 'api_key' in locals() else 'api_key não definida'}")
-        st.write(f"Valor da api_key (sanitizado): {api_key_para_mostrar}")
-
-        st.write("Tentando inicializar o cliente OpenAI (que usará httpx internamente)...")
-        # FIM DO BLOCO DE DEBUG
+    # Prefixo estável (instruções + schema da conexão) e sufixo variável
+    # (tabelas selecionadas, exemplos e pergunta), dentro do orçamento
+    pruned = schema_report["tables_after"] < schema_report["tables_before"]
+    messages, prompt_report = build_messages(
+        schema,
+        gold_examples,
+        query,
+        db_type=db_type,
+        relevant_schema=prompt_schema if pruned else None,
+        table_order=rank_tables(schema, query, fingerprint=fingerprint)
+    )
+    schema_report["prompt"] = prompt_report
+    try:
+        client = get_llm_client()
 
-        client = openai.OpenAI(api_key=api_key) # LINHA ORIGINAL
+        # Versões das bibliotecas e da chave apenas no modo de diagnóstico
+        if get_setting("nlp_engine", "diagnostics", False):
+            with st.expander("Diagnóstico do cliente OpenAI"):
+                st.json(diagnostics_info())
 
         # Fazer a chamada da API
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "Você é um assistente especializado em gerar SQL preciso."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2
-        )
+        if on_partial or on_statement:
+            result = _stream_completion(client, messages, model_settings, on_partial, on_statement)
+        else:
+            result = client.complete(
+                messages,
+                model=model_settings["model"],
+                temperature=model_settings["temperature"],
+                max_tokens=get_setting("nlp_engine", "max_tokens", 500)
+            )
 
-        # Processar a resposta
-        sql = response.choices[0].message.content.strip()
         # Limpar e formatar o SQL
-        sql = sql.replace("```sql", "").replace("```", "").strip()
-        sql = sqlparse.format(sql, reindent=True, keyword_case='upper')
-        return sql
+        sql = _clean_sql(result["content"])
+        translation_cache.store_translation(query, db_info, fingerprint, model_settings, sql)
+        return {
+            "sql": sql,
+            "source": "model",
+            "score": None,
+            "matched_question": None,
+            "schema_report": schema_report,
+            "latency": result["latency"],
+            "ttft": result.get("ttft"),
+            "tokens": (result["prompt_tokens"] or 0) + (result["completion_tokens"] or 0),
+        }
 
     except Exception as e:
-        # Adicionar mais detalhes ao erro, se possível
+        # Sem acesso ao modelo: modo degradado com o modelo de consulta local, se houver
+        degraded_confidence = get_setting("nlp_engine", "templates.degraded_min_confidence", 0.5)
+        if isinstance(e, LLMUnavailableError) and template and template["confidence"] >= degraded_confidence:
+            return _template_result(template, degraded=True)
+
         st.error(f"Erro ao gerar SQL: {str(e)}")
-        st.error(f"Traceback completo: {traceback.format_exc()}") # Adiciona o traceback completo à saída do Streamlit
+        if get_setting("nlp_engine", "diagnostics", False):
+            st.error(f"Traceback completo: {traceback.format_exc()}")
         raise e
 
+def _template_result(template, degraded=False):
+    return {
+        "sql": _clean_sql(template["sql"]),
+        "source": "template",
+        "score": template["confidence"],
+        "matched_question": None,
+        "schema_report": None,
+        "template": template["template"],
+        "degraded": degraded,
+    }
+
+def _stream_completion(client, messages, model_settings, on_partial, on_statement):
+    """Gera a resposta em streaming, repassando o SQL parcial e o comando completo"""
+    stream = client.stream(
+        messages,
+        model=model_settings["model"],
+        temperature=model_settings["temperature"],
+        max_tokens=get_setting("nlp_engine", "max_tokens", 500)
+    )
+    text = ""
+    statement_sent = False
+    for delta in stream:
+        text += delta
+        if on_partial:
+            on_partial(text.replace("```sql", "").replace("```", "").strip())
+        if on_statement and not statement_sent:
+            statement = _complete_statement(text)
+            if statement:
+                statement_sent = True
+                on_statement(_clean_sql(statement))
+
+    if on_statement and not statement_sent and text.strip():
+        on_statement(_clean_sql(text))
+
+    return {
+        "content": stream.content,
+        "latency": stream.latency,
+        "ttft": stream.ttft,
+        "prompt_tokens": stream.prompt_tokens,
+        "completion_tokens": stream.completion_tokens,
+    }
+
 def validate_query(sql, db_info):
     """Verifica se a consulta SQL é segura e válida"""
     # Verificar se é uma consulta de leitura (e não modificação)
@@ -204,11 +304,15 @@ def validate_query(sql, db_info):
     # como verificar se as tabelas e colunas existem no banco
     return True, "Consulta validada com sucesso"
 
-def improve_model(query, sql, feedback, details=None):
+def improve_model(query, sql, feedback, details=None, db_info=None):
     """Melhora o modelo com base no feedback"""
     # Registrar feedback
     _log_feedback(query, sql, feedback, details)
 
+    # Tradução rejeitada pelo usuário não deve voltar a ser servida pelo cache
+    if feedback == "negative" and query:
+        translation_cache.invalidate(question=query)
+
     # Se for feedback positivo, considerar adicionar à Gold List
     if feedback == "positive" and query and sql:
         gold_list = _get_gold_list()
@@ -222,12 +326,14 @@ def improve_model(query, sql, feedback, details=None):
             gold_list.append({
                 "query": query,
                 "sql": sql,
-                "added_at": datetime.now().isoformat()
+                "added_at": datetime.now().isoformat(),
+                "connection": pool_label(db_info) if db_info else None
             })
-            # Limitar a lista a 100 exemplos
-            if len(gold_list) > 100:
-                gold_list = gold_list[-100:]
+            max_size = get_setting("nlp_engine", "gold_list_size", 50000)
+            if max_size and len(gold_list) > max_size:
+                gold_list = gold_list[-max_size:]
             _save_gold_list(gold_list)
+            add_example(query, sql, db_info)
 
     # Em uma implementação real, você poderia treinar incrementalmente o modelo
     # ou ajustar os prompts com base no feedback acumulado
@@ -0,0 +1,416 @@
+import hashlib
+import threading
+import time
+import atexit
+from contextlib import contextmanager
+
+from settings import get_setting
+
+# Pools ativos, indexados pela identidade da conexão
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Thread que fecha periodicamente as conexões ociosas expiradas
+_evictor = None
+_evictor_stop = threading.Event()
+
+def pool_key(db_info):
+    """Identidade de uma conexão (tipo/host/porta/banco/usuário), sem a senha"""
+    return (
+        db_info["type"],
+        db_info["host"],
+        str(db_info["port"]),
+        db_info["database"],
+        db_info["username"],
+    )
+
+def _key_label(key):
+    db_type, host, port, database, username = key
+    return f"{db_type}://{username}@{host}:{port}/{database}"
+
+def pool_label(db_info):
+    """Nome legível de uma conexão, usado em logs e estatísticas"""
+    return _key_label(pool_key(db_info))
+
+class PoolTimeoutError(Exception):
+    """Nenhuma conexão ficou disponível dentro do tempo de espera"""
+
+class ConnectionPool:
+    """Pool genérico de conexões DB-API (PostgreSQL, MySQL e SQL Server)"""
+
+    def __init__(self, db_type, connect, min_size=1, max_size=5,
+                 idle_timeout=300, acquire_timeout=30, health_check=True):
+        self.db_type = db_type
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_check = health_check
+
+        self._idle = []  # lista de (conexão, instante em que foi devolvida)
+        self._in_use = 0
+        self._statements = {}  # instruções preparadas no servidor, por conexão
+        self._cond = threading.Condition()
+        self._stats = {
+            "created": 0,
+            "borrowed": 0,
+            "evicted": 0,
+            "health_failures": 0,
+            "timeouts": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def acquire(self):
+        """Obtém uma conexão do pool, criando uma nova se houver espaço"""
+        started = time.monotonic()
+        deadline = started + self.acquire_timeout
+
+        expired = []
+        try:
+            with self._cond:
+                while True:
+                    expired.extend(self._pop_expired_locked())
+
+                    if self._idle:
+                        conn, _ = self._idle.pop()
+                        self._in_use += 1
+                        break
+
+                    if self._in_use < self.max_size:
+                        self._in_use += 1
+                        conn = None
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"Nenhuma conexão disponível após {self.acquire_timeout}s "
+                            f"(máximo de {self.max_size} conexões)"
+                        )
+                    self._cond.wait(remaining)
+        finally:
+            for old in expired:
+                self._close(old)
+
+        # Criação e verificação fora do lock para não bloquear outras threads
+        try:
+            if conn is not None and self.health_check and not self._is_healthy(conn):
+                with self._cond:
+                    self._stats["health_failures"] += 1
+                self._close(conn)
+                conn = None
+
+            if conn is None:
+                conn = self._connect()
+                with self._cond:
+                    self._stats["created"] += 1
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._stats["borrowed"] += 1
+            self._stats["wait_seconds"] += time.monotonic() - started
+
+        return conn
+
+    def release(self, conn, discard=False):
+        """Devolve uma conexão ao pool (ou a descarta se estiver inutilizável)"""
+        if not discard:
+            try:
+                # Encerra a transação implícita aberta pelo driver
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard:
+            self._close(conn)
+
+        with self._cond:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def evict_idle(self):
+        """Fecha conexões ociosas há mais tempo que o idle_timeout"""
+        with self._cond:
+            expired = self._pop_expired_locked()
+        for conn in expired:
+            self._close(conn)
+        return len(expired)
+
+    def close(self):
+        """Fecha todas as conexões ociosas do pool"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def statement_cache(self, conn):
+        """Instruções já preparadas na conexão (válidas enquanto ela estiver aberta)"""
+        with self._cond:
+            return self._statements.setdefault(id(conn), {})
+
+    def stats(self):
+        """Retorna estatísticas do pool para monitoramento"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "type": self.db_type,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "prepared_statements": sum(len(s) for s in self._statements.values()),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            })
+        return stats
+
+    def _pop_expired_locked(self):
+        """Retira as conexões ociosas expiradas, mantendo ao menos min_size abertas
+
+        As conexões retiradas devem ser fechadas por quem chamou, fora do
+        lock: o close() faz I/O de rede e um servidor lento bloquearia todas
+        as threads que usam o pool.
+        """
+        if not self.idle_timeout:
+            return []
+
+        now = time.monotonic()
+        expired = []
+        # As conexões mais antigas ficam no início da lista
+        while self._idle and len(self._idle) + self._in_use > self.min_size:
+            conn, since = self._idle[0]
+            if now - since < self.idle_timeout:
+                break
+            self._idle.pop(0)
+            expired.append(conn)
+
+        self._stats["evicted"] += len(expired)
+        return expired
+
+    def _is_healthy(self, conn):
+        """Verifica se a conexão ainda está utilizável antes de entregá-la"""
+        try:
+            if self.db_type == "PostgreSQL" and conn.closed:
+                return False
+            if self.db_type == "MySQL":
+                conn.ping(reconnect=False)
+                return True
+
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _close(self, conn):
+        with self._cond:
+            self._statements.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+class OracleSessionPool:
+    """Pool de sessões Oracle baseado no cx_Oracle.SessionPool"""
+
+    def __init__(self, username, password, dsn, min_size=1, max_size=5,
+                 idle_timeout=300, acquire_timeout=30, health_check=True):
+        import cx_Oracle
+
+        self.db_type = "Oracle"
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool = cx_Oracle.SessionPool(
+            user=username,
+            password=password,
+            dsn=dsn,
+            min=min_size,
+            max=max_size,
+            increment=1,
+            threaded=True,
+            getmode=cx_Oracle.SPOOL_ATTRVAL_TIMEDWAIT,
+            wait_timeout=int(acquire_timeout * 1000),
+            timeout=int(idle_timeout),
+            # Verificação de saúde nativa ao emprestar a sessão (0 = sempre)
+            ping_interval=0 if health_check else -1,
+        )
+        self._lock = threading.Lock()
+        self._stats = {"borrowed": 0, "timeouts": 0, "wait_seconds": 0.0}
+
+    def acquire(self):
+        """Obtém uma sessão do pool Oracle"""
+        started = time.monotonic()
+        try:
+            conn = self._pool.acquire()
+        except Exception as e:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeoutError(str(e)) from e
+
+        with self._lock:
+            self._stats["borrowed"] += 1
+            self._stats["wait_seconds"] += time.monotonic() - started
+        return conn
+
+    def release(self, conn, discard=False):
+        """Devolve a sessão ao pool Oracle"""
+        try:
+            if discard:
+                self._pool.drop(conn)
+            else:
+                conn.rollback()
+                self._pool.release(conn)
+        except Exception:
+            try:
+                self._pool.drop(conn)
+            except Exception:
+                pass
+
+    def evict_idle(self):
+        """A expiração de sessões ociosas é feita pelo próprio SessionPool"""
+        return 0
+
+    def close(self):
+        """Fecha o pool Oracle"""
+        try:
+            self._pool.close(force=True)
+        except Exception:
+            pass
+
+    def stats(self):
+        """Retorna estatísticas do pool para monitoramento"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            "type": self.db_type,
+            "in_use": self._pool.busy,
+            "idle": self._pool.opened - self._pool.busy,
+            "created": self._pool.opened,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+        })
+        return stats
+
+def _pool_settings():
+    """Parâmetros dos pools definidos em config.yaml"""
+    return {
+        "min_size": get_setting("database", "pool.min_size", 1),
+        "max_size": get_setting("database", "pool.max_size", 5),
+        "idle_timeout": get_setting("database", "pool.idle_timeout", 300),
+        "acquire_timeout": get_setting("database", "pool.acquire_timeout", 30),
+        "health_check": get_setting("database", "pool.health_check", True),
+    }
+
+def _credentials_digest(db_info):
+    return hashlib.sha256(str(db_info.get("password") or "").encode()).hexdigest()
+
+def get_pool(db_info, connect):
+    """Obtém (ou cria) o pool associado à conexão descrita em db_info
+
+    `connect` é uma função sem argumentos que abre uma nova conexão; é usada
+    pelos pools genéricos. Para Oracle é criado um SessionPool nativo.
+    """
+    key = pool_key(db_info)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            if db_info["type"] == "Oracle":
+                import cx_Oracle
+                dsn = cx_Oracle.makedsn(db_info["host"], db_info["port"], service_name=db_info["database"])
+                pool = OracleSessionPool(db_info["username"], db_info["password"], dsn, **_pool_settings())
+            else:
+                pool = ConnectionPool(db_info["type"], connect, **_pool_settings())
+            # pool_key não inclui a senha: o resumo identifica um pool aberto com credenciais antigas
+            pool.credentials = _credentials_digest(db_info)
+            _pools[key] = pool
+            _start_evictor_locked()
+        return pool
+
+def _run_evictor(interval):
+    while not _evictor_stop.wait(interval):
+        try:
+            evict_idle_connections()
+        except Exception:
+            pass
+
+def _start_evictor_locked():
+    """Inicia a limpeza periódica de conexões ociosas (database.pool.evict_interval)
+
+    Sem ela, uma conexão ociosa só é fechada quando o pool volta a ser usado.
+    """
+    global _evictor
+    interval = get_setting("database", "pool.evict_interval", 60)
+    if not interval or (_evictor is not None and _evictor.is_alive()):
+        return
+    _evictor_stop.clear()
+    _evictor = threading.Thread(target=_run_evictor, args=(interval,), name="neoquery-pool-evictor", daemon=True)
+    _evictor.start()
+
+@contextmanager
+def borrow(pool):
+    """Empresta uma conexão do pool e a devolve ao final do bloco"""
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        # A devolução faz rollback; se falhar, a conexão é descartada
+        pool.release(conn)
+
+def statement_cache(db_info, conn):
+    """Cache de instruções preparadas da conexão emprestada (None se o pool não mantiver um)
+
+    O Oracle usa o cache de instruções nativo de cada sessão.
+    """
+    with _pools_lock:
+        pool = _pools.get(pool_key(db_info))
+    if isinstance(pool, ConnectionPool):
+        return pool.statement_cache(conn)
+    return None
+
+def get_pool_stats():
+    """Estatísticas de todos os pools ativos, por conexão"""
+    with _pools_lock:
+        pools = list(_pools.items())
+
+    return {_key_label(key): pool.stats() for key, pool in pools}
+
+def evict_idle_connections():
+    """Fecha conexões ociosas expiradas em todos os pools"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return sum(pool.evict_idle() for pool in pools)
+
+def close_pool(db_info):
+    """Fecha e remove o pool de uma conexão"""
+    with _pools_lock:
+        pool = _pools.pop(pool_key(db_info), None)
+    if pool:
+        pool.close()
+
+def close_stale_pool(db_info):
+    """Fecha o pool da conexão se ele foi aberto com outra senha; retorna True se fechou"""
+    with _pools_lock:
+        pool = _pools.get(pool_key(db_info))
+    if pool is None or getattr(pool, "credentials", None) == _credentials_digest(db_info):
+        return False
+    close_pool(db_info)
+    return True
+
+def close_all_pools():
+    """Fecha todos os pools (chamado ao encerrar o processo)"""
+    _evictor_stop.set()
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+atexit.register(close_all_pools)
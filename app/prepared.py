@@ -0,0 +1,240 @@
+import hashlib
+import re
+
+import sqlparse
+from sqlparse import sql as S
+from sqlparse import tokens as T
+
+from settings import get_setting
+
+def _parameter_name(column, used):
+    """Nome do parâmetro a partir da coluna comparada, sem repetições"""
+    base = re.sub(r'\W+', '_', (column or "param").lower()).strip("_") or "param"
+    name = base
+    suffix = 2
+    while name in used:
+        name = f"{base}_{suffix}"
+        suffix += 1
+    used.add(name)
+    return name
+
+def _is_parameter_literal(token):
+    """Literais de filtro (WHERE) que podem virar parâmetros
+
+    Ficam de fora literais de funções (ex.: DATE_TRUNC('month', ...)) e
+    literais tipados (DATE '...', INTERVAL '...'), que não aceitam parâmetros.
+    """
+    if token.ttype not in (T.Literal.String.Single, T.Literal.Number.Integer, T.Literal.Number.Float):
+        return False
+    return (
+        token.within(S.Where)
+        and not token.within(S.Function)
+        and not token.within(S.TypedLiteral)
+    )
+
+def _operand_name(operand):
+    """Nome da coluna em um operando: o último nome, inclusive palavras-chave
+    que o sqlparse não reconhece como nome (ex.: `data`, `valor`)"""
+    name = None
+    for token in operand.flatten():
+        if token.ttype is T.String.Symbol or (token.ttype in T.Name and token.ttype not in T.Name.Builtin):
+            name = token.value
+        elif token.ttype is T.Keyword and token.normalized != "AS":
+            name = token.value
+    return name.strip('"`[]') if name else None
+
+def _enclosing_comparison(token):
+    parent = token.parent
+    while parent is not None and not isinstance(parent, S.Comparison):
+        parent = parent.parent
+    return parent
+
+def _is_comparison_operator(token):
+    if token.ttype in T.Operator.Comparison:
+        return True
+    return token.is_keyword and token.normalized.split()[-1] in ("BETWEEN", "IN", "LIKE", "ILIKE")
+
+def parameterize_sql(sql):
+    """Extrai os literais dos filtros da consulta como parâmetros nomeados
+
+    Retorna o SQL com marcadores `:nome` no lugar dos literais e a lista de
+    parâmetros ({"name", "type", "value"}), na ordem em que aparecem. O
+    nome vem da coluna comparada (ex.: regiao, regiao_2): o operando
+    esquerdo da comparação ou, quando o sqlparse não agrupa a comparação
+    (BETWEEN, IN, colunas com nome de palavra-chave), o operando antes do
+    operador.
+    """
+    statement = sqlparse.parse(sql.strip().rstrip(";"))[0]
+    parts = []
+    parameters = []
+    used = set()
+    column = None
+    previous = None
+
+    for token in statement.flatten():
+        if _is_parameter_literal(token):
+            comparison = _enclosing_comparison(token)
+            operand = _operand_name(comparison.left) if comparison is not None else None
+            name = _parameter_name(operand or column, used)
+            if token.ttype is T.Literal.String.Single:
+                parameters.append({"name": name, "type": "text", "value": token.value[1:-1].replace("''", "'")})
+            else:
+                parameters.append({"name": name, "type": "number", "value": token.value})
+            parts.append(f":{name}")
+            continue
+
+        parts.append(token.value)
+        if _is_comparison_operator(token):
+            column = _operand_name(previous) if previous is not None else None
+        elif not token.is_whitespace and token.normalized != "NOT":
+            previous = token
+
+    return "".join(parts), parameters
+
+def coerce_value(parameter, value):
+    """Converte o valor informado para o tipo do parâmetro (ValueError se inválido)"""
+    if parameter.get("type") == "number":
+        text = str(value).strip()
+        return int(text) if re.fullmatch(r'[+-]?\d+', text) else float(text)
+    return str(value)
+
+def _sql_literal(value):
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def bind_parameters(template, style):
+    """Troca os marcadores `:nome` pelo estilo de parâmetro do driver
+
+    Estilos: "numeric" ($1, um número por nome), "qmark" (?), "format"
+    (%s), "pyformat" (%(nome)s) e "positional" (:1, :2 no Oracle, em que
+    nomes de colunas podem ser palavras reservadas). Retorna o SQL e a lista
+    de nomes na ordem em que os valores devem ser passados.
+    """
+    statement = sqlparse.parse(template)[0]
+    parts = []
+    names = []
+    for token in statement.flatten():
+        if token.ttype is not T.Name.Placeholder or not token.value.startswith(":"):
+            text = token.value
+            if style in ("format", "pyformat"):
+                text = text.replace("%", "%%")
+            parts.append(text)
+            continue
+
+        name = token.value[1:]
+        if style == "numeric":
+            if name not in names:
+                names.append(name)
+            parts.append(f"${names.index(name) + 1}")
+            continue
+
+        if style == "pyformat":
+            parts.append(f"%({name})s")
+            if name not in names:
+                names.append(name)
+            continue
+
+        names.append(name)
+        if style == "qmark":
+            parts.append("?")
+        elif style == "format":
+            parts.append("%s")
+        else:
+            parts.append(f":{len(names)}")
+
+    return "".join(parts), names
+
+def render_sql(template, values):
+    """SQL com os valores escritos como literais (exibição, log e cache de resultados)"""
+    statement = sqlparse.parse(template)[0]
+    return "".join(
+        _sql_literal(values[token.value[1:]])
+        if token.ttype is T.Name.Placeholder and token.value[1:] in values
+        else token.value
+        for token in statement.flatten()
+    )
+
+def _statement_name(sql):
+    return "neoquery_" + hashlib.sha1(sql.encode()).hexdigest()[:16]
+
+def _remember(statements, name, sql, cursor, db_type):
+    """Registra a instrução preparada, descartando a mais antiga acima do limite"""
+    statements[name] = sql
+    limit = get_setting("database", "prepared.max_per_connection", 100)
+    while limit and len(statements) > limit:
+        oldest = next(iter(statements))
+        statements.pop(oldest)
+        try:
+            if db_type == "MySQL":
+                cursor.execute(f"DEALLOCATE PREPARE {oldest}")
+            else:
+                cursor.execute(f"DEALLOCATE {oldest}")
+        except Exception:
+            pass
+
+def _execute_postgres(cursor, template, values, statements):
+    sql, names = bind_parameters(template, "numeric")
+    name = _statement_name(sql)
+    if name not in statements:
+        # Se o PostgreSQL não conseguir inferir os tipos, executa sem preparar
+        cursor.execute("SAVEPOINT neoquery_prepare")
+        try:
+            cursor.execute(f"PREPARE {name} AS {sql}")
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT neoquery_prepare")
+            plain, _ = bind_parameters(template, "pyformat")
+            cursor.execute(plain, values)
+            return
+        cursor.execute("RELEASE SAVEPOINT neoquery_prepare")
+        _remember(statements, name, sql, cursor, "PostgreSQL")
+
+    if names:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(names))})", [values[n] for n in names])
+    else:
+        cursor.execute(f"EXECUTE {name}")
+
+def _execute_mysql(cursor, template, values, statements):
+    sql, names = bind_parameters(template, "qmark")
+    name = _statement_name(sql)
+    if name not in statements:
+        try:
+            cursor.execute(f"PREPARE {name} FROM %s", (sql,))
+        except Exception:
+            plain, names = bind_parameters(template, "format")
+            cursor.execute(plain, [values[n] for n in names])
+            return
+        _remember(statements, name, sql, cursor, "MySQL")
+
+    if names:
+        variables = [f"@neoquery_p{i}" for i in range(len(names))]
+        cursor.execute(
+            "SET " + ", ".join(f"{v} = %s" for v in variables),
+            [values[n] for n in names]
+        )
+        cursor.execute(f"EXECUTE {name} USING {', '.join(variables)}")
+    else:
+        cursor.execute(f"EXECUTE {name}")
+
+def execute_prepared(cursor, db_type, template, values, statements=None):
+    """Executa o SQL parametrizado no cursor usando instruções preparadas
+
+    No PostgreSQL e no MySQL a instrução é preparada no servidor uma vez por
+    conexão (`statements` guarda as já preparadas na conexão emprestada do
+    pool). No SQL Server e no Oracle os parâmetros vão direto ao driver, que
+    reaproveita o plano (sp_prepexec) ou o cache de instruções da sessão.
+    """
+    if db_type == "PostgreSQL" and statements is not None:
+        _execute_postgres(cursor, template, values, statements)
+    elif db_type == "MySQL" and statements is not None:
+        _execute_mysql(cursor, template, values, statements)
+    elif db_type == "Oracle":
+        sql, names = bind_parameters(template, "positional")
+        cursor.execute(sql, [values[n] for n in names])
+    elif db_type == "SQL Server":
+        sql, names = bind_parameters(template, "qmark")
+        cursor.execute(sql, [values[n] for n in names])
+    else:
+        sql, names = bind_parameters(template, "pyformat" if db_type == "PostgreSQL" else "format")
+        args = values if db_type == "PostgreSQL" else [values[n] for n in names]
+        cursor.execute(sql, args)
@@ -0,0 +1,150 @@
+from settings import get_setting
+from tokens import count_tokens
+
+# Tokens de controle que a API acrescenta a cada mensagem
+MESSAGE_OVERHEAD = 4
+
+# Instruções fixas: início do prefixo estável do prompt
+SYSTEM_INSTRUCTIONS = (
+    "Você é um especialista em converter perguntas em linguagem natural para SQL. "
+    "Use apenas as tabelas e colunas do schema abaixo. "
+    "Responda apenas com o código SQL, sem explicações."
+)
+
+def _table_ddl(table, foreign_keys):
+    columns = []
+    primary_key = set(table.get("primary_key", []))
+    for column in table.get("columns", []):
+        text = f"{column['name']} {column['type']}"
+        if column["name"] in primary_key:
+            text += " PK"
+        if column["name"] in foreign_keys:
+            text += f" -> {foreign_keys[column['name']]}"
+        columns.append(text)
+    return f"{table['name']}({', '.join(columns)})"
+
+def schema_to_ddl(schema):
+    """Schema em texto compacto, uma tabela por linha: tabela(coluna tipo [PK] [-> tabela.coluna], ...)
+
+    As tabelas saem em ordem alfabética para que o mesmo schema gere sempre o
+    mesmo texto.
+    """
+    foreign_keys = {}
+    for rel in schema.get("relationships", []):
+        foreign_keys.setdefault(rel["table"], {})[rel["column"]] = f"{rel['foreign_table']}.{rel['foreign_column']}"
+
+    tables = sorted(schema.get("tables", []), key=lambda t: t["name"])
+    return "\n".join(_table_ddl(t, foreign_keys.get(t["name"], {})) for t in tables)
+
+def _system_message(db_type, schema=None, table_names=None):
+    text = f"{SYSTEM_INSTRUCTIONS}\nDialeto: {db_type}"
+    if schema is not None:
+        return f"{text}\n\nSchema:\n{schema_to_ddl(schema)}"
+    if table_names:
+        return f"{text}\n\nTabelas do banco: {', '.join(table_names)}"
+    return text
+
+def _user_message(examples, question, schema=None):
+    text = ""
+    if schema is not None:
+        text = f"Tabelas relevantes para a pergunta:\n{schema_to_ddl(schema)}\n\n"
+    if examples:
+        text += "Exemplos de consultas bem-sucedidas:\n\n"
+        for example in examples:
+            text += f"Pergunta: {example['query']}\nSQL: {example['sql']}\n\n"
+    return f"{text}Pergunta do usuário: {question}"
+
+def _message_tokens(text):
+    return count_tokens(text) + MESSAGE_OVERHEAD
+
+def _drop_tables(schema, names):
+    names = set(names)
+    return {
+        "tables": [t for t in schema.get("tables", []) if t["name"] not in names],
+        "relationships": [
+            rel for rel in schema.get("relationships", [])
+            if rel["table"] not in names and rel["foreign_table"] not in names
+        ],
+    }
+
+def build_messages(schema, examples, question, db_type="PostgreSQL", relevant_schema=None,
+                   table_order=None, budget=None):
+    """Mensagens do prompt dentro do orçamento de tokens
+
+    A mensagem de sistema é o prefixo estável, que o provedor pode
+    reaproveitar entre perguntas da mesma conexão; ela só depende do schema
+    completo. Se o schema completo cabe no orçamento e nenhuma seleção foi
+    feita (`relevant_schema` vazio), ele vai inteiro no prefixo. Caso
+    contrário o prefixo traz só a lista de nomes das tabelas (se couber em
+    metade do orçamento) e as tabelas relevantes para a pergunta
+    (`relevant_schema`, ou o schema completo) vão na mensagem do usuário,
+    junto com os exemplos e a pergunta.
+
+    Acima do orçamento (nlp_engine.prompt_max_tokens), saem primeiro os
+    exemplos menos parecidos e depois as tabelas menos relevantes, na ordem
+    inversa de `table_order` (nomes do mais para o menos relevante).
+    Retorna as mensagens e um relatório com os tokens de cada parte e o que
+    foi descartado.
+    """
+    if budget is None:
+        budget = get_setting("nlp_engine", "prompt_max_tokens", 3000)
+    examples = list(examples)
+    report = {"budget": budget, "examples_dropped": 0, "tables_dropped": 0}
+
+    system = _system_message(db_type, schema=schema)
+    prefix_tokens = _message_tokens(system)
+    minimal_tokens = _message_tokens(_user_message([], question))
+    schema_in_prefix = relevant_schema is None and (not budget or prefix_tokens + minimal_tokens <= budget)
+
+    if schema_in_prefix:
+        report["schema_in_prefix"] = True
+        variable_schema = None
+    else:
+        report["schema_in_prefix"] = False
+        table_names = sorted(t["name"] for t in schema.get("tables", []))
+        system = _system_message(db_type, table_names=table_names)
+        if budget and _message_tokens(system) > budget // 2:
+            system = _system_message(db_type)
+        prefix_tokens = _message_tokens(system)
+        variable_schema = relevant_schema if relevant_schema is not None else schema
+
+    user = _user_message(examples, question, variable_schema)
+    suffix_tokens = _message_tokens(user)
+
+    while budget and examples and prefix_tokens + suffix_tokens > budget:
+        examples.pop()
+        report["examples_dropped"] += 1
+        user = _user_message(examples, question, variable_schema)
+        suffix_tokens = _message_tokens(user)
+
+    if variable_schema is not None and budget and prefix_tokens + suffix_tokens > budget:
+        names = {t["name"] for t in variable_schema.get("tables", [])}
+        order = [n for n in (table_order or []) if n in names]
+        # Tabelas fora da ordem informada são as primeiras a sair, em ordem alfabética
+        removable = sorted(names - set(order), reverse=True) + order[::-1]
+        if len(removable) > 1:
+            # Menor quantidade de tabelas a remover que cabe no orçamento (busca binária);
+            # ao menos a tabela mais relevante permanece no prompt
+            low, high = 1, len(removable) - 1
+            while low < high:
+                middle = (low + high) // 2
+                candidate = _user_message(examples, question, _drop_tables(variable_schema, removable[:middle]))
+                if prefix_tokens + _message_tokens(candidate) > budget:
+                    low = middle + 1
+                else:
+                    high = middle
+            variable_schema = _drop_tables(variable_schema, removable[:low])
+            report["tables_dropped"] = low
+            user = _user_message(examples, question, variable_schema)
+            suffix_tokens = _message_tokens(user)
+
+    report.update({
+        "prefix_tokens": prefix_tokens,
+        "suffix_tokens": suffix_tokens,
+        "total_tokens": prefix_tokens + suffix_tokens,
+    })
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+    return messages, report
@@ -0,0 +1,157 @@
+import atexit
+import gzip
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from settings import get_setting
+
+QUERY_LOG_FILE = "query_log.txt"
+
+class QueryLogWriter:
+    """Grava o log de consultas em segundo plano, em lotes, com rotação de arquivos"""
+
+    def __init__(self, path=QUERY_LOG_FILE, batch_size=100, flush_interval=2.0,
+                 max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._queue = queue.Queue()
+        self._flush_requested = threading.Event()
+        self._flushed = threading.Condition()
+        self._pending = 0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="neoquery-query-log", daemon=True)
+        self._thread.start()
+
+    def write(self, line):
+        """Enfileira uma linha para gravação (não bloqueia a consulta)"""
+        with self._flushed:
+            self._pending += 1
+        self._queue.put(line)
+
+    def flush(self, timeout=5.0):
+        """Grava imediatamente as linhas pendentes e aguarda a conclusão"""
+        self._flush_requested.set()
+        deadline = time.monotonic() + timeout
+        with self._flushed:
+            while self._pending and time.monotonic() < deadline:
+                self._flushed.wait(deadline - time.monotonic())
+
+    def close(self):
+        """Grava o que estiver pendente e encerra a thread de gravação"""
+        if self._stopped:
+            return
+        self.flush()
+        self._stopped = True
+        self._flush_requested.set()
+        self._thread.join(timeout=5.0)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            try:
+                wait = max(0.0, min(0.1, deadline - time.monotonic()))
+                batch.append(self._queue.get(timeout=wait))
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            if batch and (len(batch) >= self.batch_size or now >= deadline or self._flush_requested.is_set()):
+                batch.extend(self._drain())
+                self._write_batch(batch)
+                batch = []
+            if now >= deadline:
+                deadline = now + self.flush_interval
+
+            if self._flush_requested.is_set() and not batch and self._queue.empty():
+                self._flush_requested.clear()
+                if self._stopped:
+                    return
+
+    def _drain(self):
+        """Retira da fila tudo o que já estiver disponível"""
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _write_batch(self, batch):
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(batch))
+            if self.max_bytes and os.path.getsize(self.path) >= self.max_bytes:
+                self._rotate()
+        except OSError:
+            pass
+        finally:
+            with self._flushed:
+                self._pending -= len(batch)
+                self._flushed.notify_all()
+
+    def _rotate(self):
+        """Move o arquivo atual para <arquivo>.1.gz, deslocando os anteriores"""
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}.gz"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}.gz")
+
+        rotated = f"{self.path}.1"
+        os.replace(self.path, rotated)
+        with open(rotated, "rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+
+        oldest = f"{self.path}.{self.backup_count + 1}.gz"
+        if os.path.exists(oldest):
+            os.remove(oldest)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """Retorna o gravador de log do processo, criando-o na primeira chamada"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = QueryLogWriter(
+                path=get_setting("database", "query_log.file", QUERY_LOG_FILE),
+                batch_size=get_setting("database", "query_log.batch_size", 100),
+                flush_interval=get_setting("database", "query_log.flush_interval", 2.0),
+                max_bytes=get_setting("database", "query_log.max_bytes", 10 * 1024 * 1024),
+                backup_count=get_setting("database", "query_log.backup_count", 5),
+            )
+        return _writer
+
+def log_query(query, connection=None, rows=None, elapsed=None, status="ok"):
+    """Registra uma consulta executada no log de consultas"""
+    timestamp = datetime.now().isoformat()
+    sql = re.sub(r'\s+', ' ', query).strip()
+    elapsed_ms = f"{elapsed * 1000:.1f}" if elapsed is not None else "-"
+    rows = rows if rows is not None else "-"
+    get_writer().write(
+        f"[{timestamp}] connection={connection or '-'} status={status} "
+        f"rows={rows} duration_ms={elapsed_ms} | {sql}\n"
+    )
+
+def flush_query_log():
+    """Grava imediatamente as linhas pendentes do log de consultas"""
+    if _writer is not None:
+        _writer.flush()
+
+def _shutdown():
+    if _writer is not None:
+        _writer.close()
+
+atexit.register(_shutdown)
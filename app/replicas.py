@@ -0,0 +1,160 @@
+import threading
+import time
+
+from pool import pool_key, pool_label
+from settings import get_setting
+
+class ReplicaState:
+    """Peso, latência e saúde de uma réplica de leitura"""
+
+    def __init__(self, db_info, weight):
+        self.db_info = db_info
+        self.weight = max(1, int(weight))
+        self.current = 0.0  # contador do round-robin ponderado
+        self.latency = None  # média móvel exponencial, em segundos
+        self.requests = 0
+        self.failures = 0
+        self.down_until = 0.0
+
+    def effective_weight(self, best_latency):
+        """Peso ajustado pela latência: réplicas mais lentas recebem menos consultas"""
+        if self.latency is None or not best_latency:
+            return float(self.weight)
+        return self.weight * max(0.1, best_latency / self.latency)
+
+class ReplicaSet:
+    """Conjunto de réplicas de uma conexão, com round-robin ponderado e failover"""
+
+    def __init__(self, primary, replicas):
+        self.primary = primary
+        self._lock = threading.Lock()
+        self._replicas = []
+        for replica in replicas:
+            weight = replica.get("weight", 1)
+            info = {k: v for k, v in primary.items() if k != "replicas"}
+            info.update({k: v for k, v in replica.items() if k != "weight"})
+            self._replicas.append(ReplicaState(info, weight))
+
+    def _find(self, db_info):
+        key = pool_key(db_info)
+        for replica in self._replicas:
+            if pool_key(replica.db_info) == key:
+                return replica
+        return None
+
+    def candidates(self):
+        """Réplicas saudáveis, a escolhida pelo balanceamento primeiro, e por fim o primário"""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [r for r in self._replicas if r.down_until <= now]
+            if not healthy:
+                return [self.primary]
+
+            # Round-robin ponderado suave (distribui as escolhas ao longo do ciclo)
+            latencies = [r.latency for r in healthy if r.latency is not None]
+            best_latency = min(latencies) if latencies else None
+            weights = {id(r): r.effective_weight(best_latency) for r in healthy}
+            total = sum(weights.values())
+            for replica in healthy:
+                replica.current += weights[id(replica)]
+            chosen = max(healthy, key=lambda r: r.current)
+            chosen.current -= total
+
+            others = sorted(
+                (r for r in healthy if r is not chosen),
+                key=lambda r: r.latency if r.latency is not None else 0.0
+            )
+            return [r.db_info for r in [chosen] + others] + [self.primary]
+
+    def record_success(self, db_info, latency):
+        alpha = get_setting("database", "replicas.latency_alpha", 0.3)
+        with self._lock:
+            replica = self._find(db_info)
+            if replica is None:
+                return
+            replica.requests += 1
+            if replica.latency is None:
+                replica.latency = latency
+            else:
+                replica.latency = alpha * latency + (1 - alpha) * replica.latency
+
+    def record_failure(self, db_info):
+        cooldown = get_setting("database", "replicas.failover_cooldown", 30)
+        with self._lock:
+            replica = self._find(db_info)
+            if replica is None:
+                return
+            replica.failures += 1
+            replica.down_until = time.monotonic() + cooldown
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "replica": pool_label(r.db_info),
+                    "weight": r.weight,
+                    "latency_ms": round(r.latency * 1000, 1) if r.latency is not None else None,
+                    "requests": r.requests,
+                    "failures": r.failures,
+                    "healthy": r.down_until <= now,
+                }
+                for r in self._replicas
+            ]
+
+# Conjuntos de réplicas ativos, indexados pela identidade da conexão primária
+_replica_sets = {}
+_replica_sets_lock = threading.Lock()
+
+def _replica_set(db_info):
+    replicas = db_info.get("replicas") or []
+    if not replicas:
+        return None
+    key = (pool_key(db_info), tuple(pool_key({**db_info, **r}) for r in replicas))
+    with _replica_sets_lock:
+        replica_set = _replica_sets.get(key)
+        if replica_set is None:
+            replica_set = ReplicaSet(db_info, replicas)
+            _replica_sets[key] = replica_set
+        return replica_set
+
+def read_targets(db_info):
+    """Conexões a tentar, em ordem, para uma consulta somente leitura"""
+    replica_set = _replica_set(db_info)
+    if replica_set is None:
+        return [db_info]
+    return replica_set.candidates()
+
+def record_success(db_info, target, latency):
+    """Registra a latência de uma consulta atendida por `target`"""
+    replica_set = _replica_set(db_info)
+    if replica_set is not None:
+        replica_set.record_success(target, latency)
+
+def record_failure(db_info, target):
+    """Retira `target` do balanceamento temporariamente após uma falha de conexão"""
+    replica_set = _replica_set(db_info)
+    if replica_set is not None:
+        replica_set.record_failure(target)
+
+def get_replica_stats():
+    """Estatísticas de cada réplica, por conexão primária"""
+    with _replica_sets_lock:
+        replica_sets = list(_replica_sets.values())
+    return {pool_label(rs.primary): rs.stats() for rs in replica_sets}
+
+def parse_replicas(text):
+    """Converte "host[:porta][:peso], ..." na lista de réplicas de db_info"""
+    replicas = []
+    for item in (text or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        parts = item.split(":")
+        replica = {"host": parts[0]}
+        if len(parts) > 1 and parts[1]:
+            replica["port"] = parts[1]
+        if len(parts) > 2 and parts[2]:
+            replica["weight"] = int(parts[2])
+        replicas.append(replica)
+    return replicas
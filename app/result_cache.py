@@ -0,0 +1,114 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import sqlparse
+
+from pool import pool_label
+from settings import get_setting
+
+_entries = OrderedDict()  # chave -> (DataFrame, tamanho em bytes, expira_em)
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "bytes": 0}
+
+def normalize_sql(sql):
+    """Normaliza o SQL para comparação (sem comentários, espaços extras ou ';' final)
+
+    Só os espaços entre tokens são reduzidos; o conteúdo de literais e
+    identificadores entre aspas fica intacto ('a  b' e 'a b' são consultas
+    diferentes).
+    """
+    sql = sqlparse.format(sql, strip_comments=True)
+    parts = []
+    tokens = (token for statement in sqlparse.parse(sql) for token in statement.flatten())
+    for token in tokens:
+        if token.is_whitespace:
+            if parts and parts[-1] != ' ':
+                parts.append(' ')
+        else:
+            parts.append(token.value)
+    return ''.join(parts).strip().rstrip(';').strip()
+
+def _cache_key(sql, db_info):
+    text = f"{pool_label(db_info)}\n{normalize_sql(sql)}"
+    return hashlib.sha1(text.encode()).hexdigest()
+
+def dataframe_bytes(df):
+    """Memória ocupada por um DataFrame, incluindo o conteúdo das strings"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def _max_bytes():
+    return get_setting("database", "result_cache.max_bytes", 256 * 1024 * 1024)
+
+def _remove_locked(key):
+    _, size, _ = _entries.pop(key)
+    _stats["bytes"] -= size
+
+def get_result(sql, db_info):
+    """Retorna o resultado em cache para o SQL nesta conexão (ou None)"""
+    key = _cache_key(sql, db_info)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+
+        df, _, expires_at = entry
+        if time.time() >= expires_at:
+            _remove_locked(key)
+            _stats["expired"] += 1
+            _stats["misses"] += 1
+            return None
+
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+
+    # Cópia rasa: protege o DataFrame em cache de alterações de estrutura
+    return df.copy(deep=False)
+
+def store_result(sql, db_info, df, ttl=None, size=None):
+    """Armazena um resultado no cache, descartando os menos usados se necessário"""
+    if not get_setting("database", "result_cache.enabled", True):
+        return False
+
+    ttl = ttl if ttl is not None else get_setting("database", "result_cache.ttl", 600)
+    size = size if size is not None else dataframe_bytes(df)
+    max_bytes = _max_bytes()
+    if size > max_bytes:
+        return False
+
+    key = _cache_key(sql, db_info)
+    with _lock:
+        if key in _entries:
+            _remove_locked(key)
+
+        while _entries and _stats["bytes"] + size > max_bytes:
+            oldest = next(iter(_entries))
+            _remove_locked(oldest)
+            _stats["evictions"] += 1
+
+        _entries[key] = (df, size, time.time() + ttl)
+        _stats["bytes"] += size
+
+    return True
+
+def invalidate(sql=None, db_info=None):
+    """Remove um resultado específico do cache, ou esvazia o cache inteiro"""
+    with _lock:
+        if sql is None or db_info is None:
+            _entries.clear()
+            _stats["bytes"] = 0
+            return
+
+        key = _cache_key(sql, db_info)
+        if key in _entries:
+            _remove_locked(key)
+
+def get_cache_stats():
+    """Contadores de acertos, falhas e ocupação do cache de resultados"""
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+        stats["max_bytes"] = _max_bytes()
+    return stats
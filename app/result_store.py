@@ -0,0 +1,162 @@
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from settings import get_setting
+
+# Prefixo dos diretórios temporários de cada sessão
+SPILL_DIR_PREFIX = "neoquery_spill_"
+
+_session_dirs = set()
+_session_dirs_lock = threading.Lock()
+
+class SpilledResult:
+    """Resultado gravado em um arquivo Arrow e lido sob demanda, página a página"""
+
+    def __init__(self, path, num_rows, columns):
+        self.id = os.path.splitext(os.path.basename(path))[0]
+        self.path = path
+        self.num_rows = num_rows
+        self.columns = columns
+        self._table = None
+        self._sort_indices = {}
+
+    def _open(self):
+        """Abre o arquivo com memory map (sem copiar os dados para a memória)"""
+        if self._table is None:
+            source = pa.memory_map(self.path, "r")
+            self._table = pa.ipc.open_file(source).read_all()
+        return self._table
+
+    def page(self, offset=0, limit=100, sort_by=None, ascending=True, columns=None):
+        """Retorna uma página do resultado como DataFrame
+
+        `sort_by` ordena pelo nome de coluna informado (os índices de ordenação
+        são calculados uma vez e reaproveitados entre páginas) e `columns`
+        seleciona apenas as colunas desejadas.
+        """
+        table = self._open()
+        if columns:
+            table = table.select(list(columns))
+
+        offset = max(0, int(offset))
+        limit = max(0, int(limit))
+        if sort_by:
+            key = (sort_by, ascending)
+            indices = self._sort_indices.get(key)
+            if indices is None:
+                order = "ascending" if ascending else "descending"
+                values = self._open().column(sort_by)
+                if pa.types.is_dictionary(values.type):
+                    # Colunas categóricas: o Arrow não ordena dicionários, só os valores
+                    values = values.cast(values.type.value_type)
+                indices = pc.sort_indices(pa.table({sort_by: values}), sort_keys=[(sort_by, order)])
+                self._sort_indices[key] = indices
+            table = table.take(indices.slice(offset, limit))
+        else:
+            table = table.slice(offset, limit)
+
+        return table.to_pandas()
+
+    def to_dataframe(self):
+        """Lê o resultado completo (para exportação)"""
+        return self._open().to_pandas()
+
+    def close(self):
+        """Libera o mapeamento e remove o arquivo"""
+        self._table = None
+        self._sort_indices = {}
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+class ResultStore:
+    """Resultados gravados em disco de uma sessão; os arquivos são removidos ao final dela"""
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix=SPILL_DIR_PREFIX)
+        self._results = {}
+        with _session_dirs_lock:
+            _session_dirs.add(self.directory)
+        # Quando a sessão é descartada (objeto coletado), o diretório é apagado
+        self._finalizer = weakref.finalize(self, _remove_dir, self.directory)
+
+    def spill(self, df):
+        """Grava o DataFrame em um arquivo Arrow e retorna o SpilledResult"""
+        path = os.path.join(self.directory, f"{uuid.uuid4().hex}.arrow")
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Colunas de texto com tipos misturados são gravadas como texto
+            text_columns = {c: "string" for c in df.columns[df.dtypes == object]}
+            table = pa.Table.from_pandas(df.astype(text_columns), preserve_index=False)
+        # Sem compressão: o arquivo pode ser mapeado diretamente na leitura
+        feather.write_feather(table, path, compression="uncompressed")
+
+        result = SpilledResult(path, table.num_rows, list(df.columns))
+        self._results[result.id] = result
+        return result
+
+    def get(self, result_id):
+        return self._results.get(result_id)
+
+    def discard(self, result_id):
+        result = self._results.pop(result_id, None)
+        if result:
+            result.close()
+
+    def close(self):
+        """Remove todos os arquivos da sessão"""
+        for result in self._results.values():
+            result.close()
+        self._results = {}
+        self._finalizer()
+
+def should_spill(df):
+    """Indica se o resultado ultrapassa o limite para ficar em memória"""
+    threshold = get_setting("database", "result_store.spill_bytes", 50 * 1024 * 1024)
+    if not threshold:
+        return False
+    size = df.attrs.get("memory_after")
+    if size is None:
+        size = int(df.memory_usage(index=True, deep=True).sum())
+    return size > threshold
+
+def _remove_dir(directory):
+    shutil.rmtree(directory, ignore_errors=True)
+    with _session_dirs_lock:
+        _session_dirs.discard(directory)
+
+def cleanup_stale_spills(max_age=None):
+    """Remove diretórios de sessões antigas que não foram limpos (ex.: após uma queda)"""
+    if max_age is None:
+        max_age = get_setting("database", "result_store.max_age", 24 * 3600)
+    base = tempfile.gettempdir()
+    now = time.time()
+    for name in os.listdir(base):
+        path = os.path.join(base, name)
+        if not name.startswith(SPILL_DIR_PREFIX) or path in _session_dirs:
+            continue
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+def _cleanup_all():
+    with _session_dirs_lock:
+        directories = list(_session_dirs)
+    for directory in directories:
+        _remove_dir(directory)
+
+atexit.register(_cleanup_all)
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+
+from pool import pool_label
+from settings import get_setting
+
+# Arquivo onde o cache de schemas é persistido entre reinicializações
+SCHEMA_CACHE_FILE = get_setting("database", "schema_cache.file", "schema_cache.json")
+
+_cache = None  # label da conexão -> entrada do cache
+_lock = threading.RLock()
+_stats = {"hits": 0, "probes": 0, "reloads": 0}
+
+def _load_cache_file():
+    """Carrega o cache persistido em disco"""
+    if not os.path.exists(SCHEMA_CACHE_FILE):
+        return {}
+
+    try:
+        with open(SCHEMA_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except:
+        return {}
+
+def _save_cache_file(cache):
+    """Salva o cache em disco (escrita atômica)"""
+    tmp_file = f"{SCHEMA_CACHE_FILE}.tmp"
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, SCHEMA_CACHE_FILE)
+    except OSError:
+        pass
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = _load_cache_file()
+    return _cache
+
+def _probe(probe):
+    """Executa a sonda de impressão digital, ignorando falhas"""
+    if probe is None:
+        return None
+    try:
+        return probe()
+    except Exception:
+        return None
+
+def get_schema(db_info, load, probe=None, refresh=False):
+    """Obtém o schema de uma conexão a partir do cache
+
+    `load` lê o catálogo completo e retorna o schema; `probe` retorna uma
+    impressão digital barata do catálogo. Enquanto a entrada estiver dentro
+    do TTL ela é usada diretamente; depois disso a impressão digital é
+    comparada e o schema só é relido se o catálogo tiver mudado.
+    """
+    ttl = get_setting("database", "schema_cache.ttl", 3600)
+    key = pool_label(db_info)
+    now = time.time()
+
+    with _lock:
+        entry = None if refresh else _get_cache().get(key)
+
+        if entry and now - entry["checked_at"] < ttl:
+            _stats["hits"] += 1
+            return entry["schema"]
+
+    fingerprint = _probe(probe)
+    if entry and fingerprint is not None:
+        with _lock:
+            _stats["probes"] += 1
+            if fingerprint == entry.get("fingerprint"):
+                entry["checked_at"] = now
+                _save_cache_file(_get_cache())
+                return entry["schema"]
+
+    schema = load()
+    if schema is None:
+        return None
+
+    with _lock:
+        _stats["reloads"] += 1
+        _get_cache()[key] = {
+            "schema": schema,
+            "fingerprint": fingerprint,
+            "loaded_at": now,
+            "checked_at": now,
+        }
+        _save_cache_file(_get_cache())
+
+    return schema
+
+def get_fingerprint(db_info):
+    """Impressão digital do schema em cache (ou None se não houver)"""
+    with _lock:
+        entry = _get_cache().get(pool_label(db_info))
+        return entry.get("fingerprint") if entry else None
+
+def invalidate(db_info=None):
+    """Remove do cache o schema de uma conexão (ou de todas)"""
+    with _lock:
+        cache = _get_cache()
+        if db_info is None:
+            cache.clear()
+        else:
+            cache.pop(pool_label(db_info), None)
+        _save_cache_file(cache)
+
+def get_cache_stats():
+    """Estatísticas de uso do cache de schemas"""
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_get_cache())
+    return stats
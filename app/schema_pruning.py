@@ -0,0 +1,131 @@
+import re
+import threading
+from collections import OrderedDict
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import linear_kernel
+
+from prompt_builder import schema_to_ddl
+from settings import get_setting
+from tokens import count_tokens
+from translation_cache import normalize_question, schema_fingerprint
+
+# Índices dos schemas usados recentemente (impressão digital -> TableIndex)
+MAX_INDEXES = 8
+
+def _split_identifier(name):
+    """Separa as palavras de um identificador (vendas_itens, VendasItens, dbo.vendas)"""
+    name = re.sub(r'([a-z])([A-Z])', r'\1 \2', name)
+    return normalize_question(re.sub(r'[_.]+', ' ', name))
+
+class TableIndex:
+    """Índice TF-IDF das tabelas de um schema (nome, colunas e vizinhas por chave estrangeira)"""
+
+    def __init__(self, schema):
+        self.tables = [t["name"] for t in schema.get("tables", [])]
+        self.neighbours = {name: set() for name in self.tables}
+        for rel in schema.get("relationships", []):
+            if rel["table"] in self.neighbours and rel["foreign_table"] in self.neighbours:
+                self.neighbours[rel["table"]].add(rel["foreign_table"])
+                self.neighbours[rel["foreign_table"]].add(rel["table"])
+
+        documents = []
+        for table in schema.get("tables", []):
+            words = [_split_identifier(table["name"])] * 3  # o nome da tabela pesa mais
+            words += [_split_identifier(c["name"]) for c in table.get("columns", [])]
+            words += [_split_identifier(n) for n in sorted(self.neighbours[table["name"]])]
+            documents.append(" ".join(words))
+
+        self._vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), sublinear_tf=True)
+        self._matrix = self._vectorizer.fit_transform(documents) if documents else None
+
+    def scores(self, question):
+        """Relevância de cada tabela para a pergunta (0 a 1)"""
+        if self._matrix is None:
+            return {}
+        vector = self._vectorizer.transform([normalize_question(question)])
+        return dict(zip(self.tables, linear_kernel(vector, self._matrix).ravel()))
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+def _get_index(schema, fingerprint=None):
+    key = fingerprint or schema_fingerprint(schema)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+
+    index = TableIndex(schema)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+def rank_tables(schema, question, fingerprint=None):
+    """Nomes das tabelas da mais para a menos relevante (empates em ordem alfabética)"""
+    scores = _get_index(schema, fingerprint).scores(question)
+    return sorted(scores, key=lambda name: (-scores[name], name))
+
+def select_tables(schema, question, top_k=None, max_tables=None, fingerprint=None):
+    """Tabelas mais relevantes para a pergunta, mais as vizinhas por chave estrangeira
+
+    As `top_k` tabelas de maior relevância são escolhidas e o conjunto é
+    expandido com as tabelas ligadas a elas por chave estrangeira (para
+    permitir os JOINs), até `max_tables`.
+    """
+    if top_k is None:
+        top_k = get_setting("nlp_engine", "schema_pruning.top_k", 8)
+    if max_tables is None:
+        max_tables = get_setting("nlp_engine", "schema_pruning.max_tables", 20)
+
+    index = _get_index(schema, fingerprint)
+    scores = index.scores(question)
+    ranked = sorted(scores, key=lambda name: (-scores[name], name))
+    selected = [name for name in ranked[:top_k] if scores[name] > 0] or ranked[:top_k]
+
+    neighbours = set()
+    for name in selected:
+        neighbours |= index.neighbours.get(name, set())
+    neighbours -= set(selected)
+    for name in sorted(neighbours, key=lambda n: scores.get(n, 0), reverse=True):
+        if len(selected) >= max_tables:
+            break
+        selected.append(name)
+
+    return selected
+
+def prune_schema(schema, question, fingerprint=None):
+    """Reduz o schema às tabelas relevantes para a pergunta
+
+    Retorna o schema reduzido (mesma estrutura: tables e relationships) e um
+    relatório com a quantidade de tabelas e a estimativa de tokens antes e
+    depois. Schemas pequenos (até schema_pruning.min_tables) não são reduzidos.
+    `fingerprint` (de translation_cache.schema_fingerprint) evita recalculá-la.
+    """
+    tables = schema.get("tables", [])
+    tokens_before = count_tokens(schema_to_ddl(schema))
+    report = {
+        "tables_before": len(tables),
+        "tables_after": len(tables),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_before,
+    }
+
+    min_tables = get_setting("nlp_engine", "schema_pruning.min_tables", 10)
+    if not get_setting("nlp_engine", "schema_pruning.enabled", True) or len(tables) <= min_tables:
+        return schema, report
+
+    selected = set(select_tables(schema, question, fingerprint=fingerprint))
+    pruned = {
+        "tables": [t for t in tables if t["name"] in selected],
+        "relationships": [
+            rel for rel in schema.get("relationships", [])
+            if rel["table"] in selected and rel["foreign_table"] in selected
+        ],
+    }
+    report["tables_after"] = len(pruned["tables"])
+    report["tokens_after"] = count_tokens(schema_to_ddl(pruned))
+    return pruned, report
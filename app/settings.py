@@ -0,0 +1,38 @@
+import os
+import yaml
+
+# Locais onde o config.yaml é procurado (na ordem)
+CONFIG_PATHS = [
+    "config.yaml",
+    "../config.yaml",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config.yaml"),
+]
+
+_config = None
+
+def load_config():
+    """Carrega o arquivo de configuração da aplicação (apenas uma vez por processo)"""
+    global _config
+    if _config is not None:
+        return _config
+
+    _config = {}
+    for path in CONFIG_PATHS:
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    _config = yaml.safe_load(f) or {}
+            except:
+                _config = {}
+            break
+
+    return _config
+
+def get_setting(section, key, default=None):
+    """Obtém um valor de configuração, com valor padrão caso não exista"""
+    value = load_config().get(section) or {}
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return default
+        value = value[part]
+    return value
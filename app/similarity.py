@@ -0,0 +1,204 @@
+import json
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import linear_kernel
+
+from pool import pool_label
+from settings import get_setting
+from translation_cache import normalize_question, singularize
+
+# Fontes de pares pergunta -> SQL já validados
+GOLD_LIST_FILE = "gold_list.json"
+QUERY_HISTORY_FILE = "query_history.json"
+
+TABLE_RE = re.compile(r'\b(?:from|join)\s+([\w."`\[\]]+)', re.IGNORECASE)
+
+# Palavras que não mudam o sentido da pergunta ("por região" = "em cada região")
+STOPWORDS = {
+    "o", "a", "os", "as", "de", "da", "do", "das", "dos", "em", "no", "na", "nos", "nas",
+    "por", "cada", "para", "pelo", "pela", "e", "me", "mostre", "qual", "quais", "sao",
+}
+
+# Negações, comparativos e ordenações: mudam o sentido sem mudar quase nada do texto
+# ("compraram" x "não compraram", "mais vendidos" x "menos vendidos")
+POLARITY_WORDS = {
+    "nao": "nao", "nunca": "nao", "nenhum": "nao", "nenhuma": "nao", "sem": "sem",
+    "mais": "mais", "menos": "menos",
+    "maior": "maior", "maiores": "maior", "menor": "menor", "menores": "menor",
+    "melhor": "melhor", "melhores": "melhor", "pior": "pior", "piores": "pior",
+    "primeiro": "primeiro", "primeira": "primeiro", "primeiros": "primeiro", "primeiras": "primeiro",
+    "ultimo": "ultimo", "ultima": "ultimo", "ultimos": "ultimo", "ultimas": "ultimo",
+    "asc": "asc", "crescente": "asc", "desc": "desc", "decrescente": "desc",
+    "acima": "acima", "abaixo": "abaixo", "antes": "antes", "depois": "depois",
+}
+
+QUOTED_RE = re.compile(r'"([^"]*)"|\'([^\']*)\'')
+WORD_RE = re.compile(r'\w+')
+
+def literal_tokens(question):
+    """Números, trechos entre aspas, nomes próprios, negações e comparativos da pergunta
+
+    Duas perguntas só podem compartilhar o SQL se esses valores forem iguais:
+    "top 5" e "top 10", "em 2023" e "em 2024", "do Norte" e "do Sul",
+    "compraram" e "não compraram" ou "mais vendidos" e "menos vendidos" são
+    quase idênticas no texto, mas não na consulta.
+    """
+    text = unicodedata.normalize("NFC", question or "")
+    tokens = {normalize_question(a or b) for a, b in QUOTED_RE.findall(text)}
+    words = WORD_RE.findall(QUOTED_RE.sub(" ", text))
+    for position, word in enumerate(words):
+        if word.isdigit():
+            tokens.add(word)
+        elif position > 0 and word[0].isupper():
+            # A primeira palavra é maiúscula só por iniciar a frase
+            tokens.add(normalize_question(word))
+    for word in normalize_question(text).split():
+        if word in POLARITY_WORDS:
+            # Prefixo para não confundir com um texto entre aspas igual à palavra
+            tokens.add("~" + POLARITY_WORDS[word])
+    return frozenset(tokens)
+
+def content_words(question):
+    """Palavras significativas no singular, sem ordem (para reconhecer paráfrases)"""
+    return frozenset(singularize(w) for w in normalize_question(question).split() if w not in STOPWORDS)
+
+def _word_similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class SimilarityIndex:
+    """Índice TF-IDF de n-gramas de caracteres sobre perguntas já respondidas"""
+
+    def __init__(self, pairs):
+        self.pairs = pairs
+        self._vectorizer = None
+        self._matrix = None
+        self._connections = np.array([p.get("connection") for p in pairs], dtype=object)
+        if pairs:
+            # n-gramas de caracteres toleram variações de flexão e pequenos erros de digitação
+            self._vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), sublinear_tf=True)
+            self._matrix = self._vectorizer.fit_transform([p["normalized"] for p in pairs])
+
+    def search(self, question, k=1, connection=None):
+        """Retorna até k pares mais parecidos com a pergunta, com a similaridade (0 a 1)
+
+        A similaridade é a maior entre a de n-gramas de caracteres (tolera
+        flexões e erros de digitação) e a das palavras significativas (tolera
+        mudança de ordem, como "vendas totais em cada região" e "total de
+        vendas por região"). Com `connection`, só entram os pares dessa
+        conexão e os sem conexão registrada.
+        """
+        if self._matrix is None:
+            return []
+        vector = self._vectorizer.transform([normalize_question(question)])
+        # Vetores TF-IDF já são normalizados: o produto interno é o cosseno
+        scores = linear_kernel(vector, self._matrix).ravel()
+        if connection is not None:
+            allowed = (self._connections == None) | (self._connections == connection)  # noqa: E711
+            scores = np.where(allowed, scores, 0.0)
+
+        words = content_words(question)
+        candidates = scores.argsort()[::-1][:max(k, 20)]
+        results = []
+        for i in candidates:
+            if scores[i] <= 0:
+                break
+            score = max(float(scores[i]), _word_similarity(words, self.pairs[i]["words"]))
+            results.append(dict(self.pairs[i], score=score))
+        results.sort(key=lambda r: r["score"], reverse=True)
+        return results[:k]
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except:
+        return []
+
+def _load_pairs():
+    """Pares da lista de referência e do histórico (a lista de referência tem prioridade)"""
+    pairs = {}
+    for item in _read_json(GOLD_LIST_FILE):
+        normalized = normalize_question(item.get("query"))
+        if normalized and item.get("sql"):
+            pairs.setdefault((normalized, item.get("connection")), {
+                "question": item["query"], "sql": item["sql"], "normalized": normalized, "source": "gold",
+                "connection": item.get("connection"),
+            })
+    for item in _read_json(QUERY_HISTORY_FILE):
+        normalized = normalize_question(item.get("query_text"))
+        if normalized and item.get("sql_text") and item.get("status") == "success":
+            pairs.setdefault((normalized, item.get("connection")), {
+                "question": item["query_text"], "sql": item["sql_text"], "normalized": normalized, "source": "history",
+                "connection": item.get("connection"),
+            })
+    for pair in pairs.values():
+        pair["words"] = content_words(pair["question"])
+        pair["literals"] = literal_tokens(pair["question"])
+    return list(pairs.values())
+
+def _sources_signature():
+    signature = []
+    for path in (GOLD_LIST_FILE, QUERY_HISTORY_FILE):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+_index = None
+_index_signature = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """Índice atual, reconstruído quando a lista de referência ou o histórico mudam"""
+    global _index, _index_signature
+    signature = _sources_signature()
+    with _index_lock:
+        if _index is None or signature != _index_signature:
+            _index = SimilarityIndex(_load_pairs())
+            _index_signature = signature
+        return _index
+
+def _sql_tables(sql):
+    return {m.strip('"`[]').split(".")[-1].strip('"`[]').lower() for m in TABLE_RE.findall(sql)}
+
+def _fits_schema(sql, schema):
+    """O SQL só usa tabelas que existem no schema atual"""
+    if not schema or not schema.get("tables"):
+        return True
+    known = {t["name"].split(".")[-1].lower() for t in schema["tables"]}
+    return _sql_tables(sql) <= known
+
+def find_similar(question, schema=None, threshold=None, db_info=None):
+    """Procura uma pergunta já respondida parecida o suficiente para reaproveitar o SQL
+
+    Retorna o par encontrado ({"question", "sql", "score", "source"}) ou None
+    se nenhum atingir o limiar (nlp_engine.similarity.threshold), se os
+    números, textos entre aspas, nomes próprios, negações ou comparativos
+    forem diferentes (literal_tokens), ou se o SQL usar tabelas que não
+    existem no schema da conexão atual. Com
+    `db_info`, pares registrados para outras conexões são ignorados.
+    """
+    if not get_setting("nlp_engine", "similarity.enabled", True):
+        return None
+    if threshold is None:
+        threshold = get_setting("nlp_engine", "similarity.threshold", 0.92)
+
+    connection = pool_label(db_info) if db_info else None
+    literals = literal_tokens(question)
+    for match in get_index().search(question, k=5, connection=connection):
+        if match["score"] < threshold:
+            break
+        if match["literals"] == literals and _fits_schema(match["sql"], schema):
+            return match
+    return None
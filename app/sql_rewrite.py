@@ -0,0 +1,156 @@
+import re
+
+import sqlparse
+from sqlparse import tokens as T
+
+def _strip(sql):
+    """Remove espaços e ';' do final da instrução"""
+    return sql.strip().rstrip(";").strip()
+
+def _top_level_keywords(sql):
+    """Palavras-chave do nível principal da consulta (ignora subconsultas)"""
+    statement = sqlparse.parse(sql)[0]
+    return [
+        token.normalized
+        for token in statement.tokens
+        if token.ttype in (T.Keyword, T.Keyword.DML)
+    ]
+
+SET_OPERATIONS = ("UNION", "INTERSECT", "EXCEPT", "MINUS")
+
+def _has_set_operation(statement):
+    """A consulta principal combina SELECTs (UNION, INTERSECT, EXCEPT/MINUS)"""
+    return any(
+        token.ttype is T.Keyword and token.normalized.split()[0] in SET_OPERATIONS
+        for token in statement.tokens
+    )
+
+def _has_cte(statement):
+    return any(token.ttype is T.Keyword.CTE for token in statement.tokens)
+
+def _replace_number(sql, match, group, limit):
+    """Substitui o número capturado por `limit` se ele for maior"""
+    if int(match.group(group)) <= limit:
+        return sql
+    return sql[:match.start(group)] + str(limit) + sql[match.end(group):]
+
+LIMIT_RE = re.compile(r'\blimit\s+(\d+)(\s+offset\s+\d+)?\s*$', re.IGNORECASE)
+FETCH_RE = re.compile(r'\bfetch\s+(?:first|next)\s+(\d+)\s+rows?\s+only\s*$', re.IGNORECASE)
+TOP_RE = re.compile(r'^(select\s+(?:distinct\s+)?)top\s*\(?\s*(\d+)\s*\)?', re.IGNORECASE)
+
+def add_row_limit(sql, db_type, limit):
+    """Limita a consulta a `limit` linhas com a sintaxe do dialeto
+
+    LIMIT no PostgreSQL/MySQL, TOP ou OFFSET/FETCH no SQL Server e
+    FETCH FIRST no Oracle. Um limite já existente só é reduzido, nunca
+    ampliado. Quando o limite não pode ser escrito na própria consulta
+    (LIMIT que não está no final, como OFFSET 5 LIMIT 10; UNION sem ORDER
+    BY no SQL Server, em que o TOP valeria só para o primeiro SELECT), a
+    consulta é envolvida: SELECT ... FROM (<consulta>) AS neoquery_q.
+    """
+    sql = _strip(sql)
+    limit = int(limit)
+
+    if db_type in ("PostgreSQL", "MySQL"):
+        match = LIMIT_RE.search(sql)
+        if match:
+            return _replace_number(sql, match, 1, limit)
+        keywords = _top_level_keywords(sql)
+        if "LIMIT" in keywords or "OFFSET" in keywords:
+            return f"SELECT * FROM (\n{sql}\n) AS neoquery_q\nLIMIT {limit}"
+        return f"{sql}\nLIMIT {limit}"
+
+    if db_type == "Oracle":
+        match = FETCH_RE.search(sql)
+        if match:
+            return _replace_number(sql, match, 1, limit)
+        return f"{sql}\nFETCH FIRST {limit} ROWS ONLY"
+
+    if db_type == "SQL Server":
+        match = FETCH_RE.search(sql)
+        if match:
+            return _replace_number(sql, match, 1, limit)
+
+        if "ORDER BY" in _top_level_keywords(sql):
+            return f"{sql}\nOFFSET 0 ROWS FETCH NEXT {limit} ROWS ONLY"
+
+        # Sem ORDER BY: TOP logo após o SELECT principal (depois de um eventual WITH)
+        statement = sqlparse.parse(sql)[0]
+        prefix = ""
+        for token in statement.tokens:
+            if token.ttype is T.Keyword.DML and token.normalized == "SELECT":
+                break
+            prefix += str(token)
+        main_select = sql[len(prefix):]
+
+        if _has_set_operation(statement):
+            return prefix + f"SELECT TOP {limit} * FROM (\n{main_select}\n) AS neoquery_q"
+
+        match = TOP_RE.match(main_select)
+        if match:
+            return prefix + _replace_number(main_select, match, 2, limit)
+        return prefix + re.sub(
+            r'^(select\s+(?:distinct\s+)?)', rf'\g<1>TOP {limit} ', main_select, count=1, flags=re.IGNORECASE
+        )
+
+    raise ValueError(f"Tipo de banco de dados não suportado: {db_type}")
+
+AGGREGATE_RE = re.compile(r'\b(count|sum|avg|min|max|stddev|variance)\s*\(', re.IGNORECASE)
+
+def _single_table_from(statement):
+    """Retorna o identificador da única tabela do FROM principal (ou None)"""
+    keywords = [t.normalized for t in statement.tokens if t.is_keyword]
+    if any("JOIN" in k for k in keywords) or "GROUP BY" in keywords or "DISTINCT" in keywords:
+        return None
+
+    tokens = [t for t in statement.tokens if not t.is_whitespace]
+    for i, token in enumerate(tokens):
+        if token.is_keyword and token.normalized == "FROM" and i + 1 < len(tokens):
+            candidate = tokens[i + 1]
+            if isinstance(candidate, sqlparse.sql.Identifier) and not any(
+                isinstance(t, sqlparse.sql.Parenthesis) for t in candidate.tokens
+            ):
+                return candidate
+            return None
+    return None
+
+def add_table_sample(sql, db_type, percent):
+    """Aplica amostragem de tabela (TABLESAMPLE/SAMPLE) em consultas sem agregação
+
+    Só é aplicável a consultas sobre uma única tabela, sem agregações,
+    GROUP BY, DISTINCT, JOIN, WITH ou UNION/INTERSECT/EXCEPT (uma CTE não
+    aceita amostragem e só o primeiro SELECT seria amostrado). Retorna None
+    quando não for possível.
+    """
+    sql = _strip(sql)
+    if db_type == "MySQL" or AGGREGATE_RE.search(sql):
+        return None
+
+    statement = sqlparse.parse(sql)[0]
+    if statement.get_type() != "SELECT" or _has_cte(statement) or _has_set_operation(statement):
+        return None
+
+    table = _single_table_from(statement)
+    if table is None:
+        return None
+
+    text = str(table)
+    if db_type == "Oracle":
+        # No Oracle a amostragem vem antes do alias: FROM vendas SAMPLE (1) v
+        match = re.match(r'^(\S+)(.*)$', text, re.DOTALL)
+        sampled = f"{match.group(1)} SAMPLE ({percent}){match.group(2)}"
+    elif db_type == "SQL Server":
+        sampled = f"{text} TABLESAMPLE ({percent} PERCENT)"
+    else:
+        sampled = f"{text} TABLESAMPLE SYSTEM ({percent})"
+
+    table.tokens = [sqlparse.sql.Token(T.Name, sampled)]
+    return str(statement)
+
+def preview_sql(sql, db_type, rows, sample_percent=None):
+    """Versão de prévia da consulta: amostra da tabela (se pedida e possível) + limite de linhas"""
+    if sample_percent:
+        sampled = add_table_sample(sql, db_type, sample_percent)
+        if sampled:
+            sql = sampled
+    return add_row_limit(sql, db_type, rows)
@@ -0,0 +1,342 @@
+import re
+import unicodedata
+
+from schema_pruning import _split_identifier
+from settings import get_setting
+from sql_rewrite import add_row_limit
+from translation_cache import normalize_question, singularize
+
+# Palavras de ligação ignoradas ao comparar trechos da pergunta com nomes do schema
+STOPWORDS = {"de", "da", "do", "das", "dos", "o", "a", "os", "as", "em", "no", "na", "nos", "nas", "e", "the", "of"}
+
+NUMERIC_RE = re.compile(r'int|numeric|decimal|float|double|real|money|number', re.IGNORECASE)
+DATE_RE = re.compile(r'date|time', re.IGNORECASE)
+TEXT_RE = re.compile(r'char|text|string|clob', re.IGNORECASE)
+
+# Preferência ao escolher a coluna de valor, o rótulo e a localização de uma tabela
+MEASURE_HINTS = ("valor", "total", "montante", "receita", "preco", "amount", "price", "quantidade", "qtd")
+LABEL_HINTS = ("nome", "name", "descricao", "titulo", "title")
+LOCATION_HINTS = ("cidade", "estado", "uf", "regiao", "pais", "bairro", "city", "state", "region", "country")
+
+TIME_UNITS = {"dia": "day", "mes": "month", "ano": "year", "day": "day", "month": "month", "year": "year"}
+
+# Cortesias no início da pergunta ("mostre os", "quais são as"...)
+PREFIX = r'^(?:(?:qual|quais) (?:e|sao|foi|foram) |mostre(?: me)? |liste |exiba |me (?:de|mostre) )?(?:o |a |os |as )?'
+YEAR_SUFFIX = r'(?: (?:em|de|no ano de) (?P<year>\d{4}))?$'
+
+TOP_RE = re.compile(
+    PREFIX + r'(?:top (?P<n>\d+)|(?P<n2>\d+) (?:maiores|melhores|principais)) (?P<entity>[\w ]+?) '
+    r'(?:por|com mais|com maior|em) (?P<metric>[\w ]+?)' + YEAR_SUFFIX
+)
+TOTAL_RE = re.compile(
+    PREFIX + r'(?:total|soma|somatorio|valor total) (?:de |do |da |das |dos )?(?P<metric>[\w ]+?) '
+    r'(?:por|em cada|por cada) (?P<group>[\w ]+?)' + YEAR_SUFFIX
+)
+COUNT_RE = re.compile(
+    PREFIX + r'(?:quant[oa]s|numero de|quantidade de) (?P<entity>[\w ]+?)'
+    r'(?: (?:existem|ha|temos|tem|foram registrad[oa]s|estao cadastrad[oa]s|cadastrad[oa]s))?'
+    r'(?: (?P<prep>em|no|na|de|do|da|por) (?P<filter>[\w ]+))?$'
+)
+
+def _phrase_key(text):
+    return " ".join(singularize(w) for w in text.split() if w not in STOPWORDS)
+
+def _quote(value):
+    return "'" + value.replace("'", "''") + "'"
+
+class SchemaVocabulary:
+    """Nomes de tabelas e colunas do schema indexados pela forma normalizada"""
+
+    def __init__(self, schema):
+        self.tables = {}
+        for table in schema.get("tables", []):
+            key = _phrase_key(_split_identifier(table["name"].split(".")[-1]))
+            self.tables.setdefault(key, table)
+        self.relationships = schema.get("relationships", [])
+
+    def table(self, phrase):
+        return self.tables.get(_phrase_key(phrase))
+
+    def column(self, phrase, tables):
+        """Primeira coluna com o nome do trecho, procurando nas tabelas na ordem dada"""
+        key = _phrase_key(phrase)
+        for table in tables:
+            for column in table.get("columns", []):
+                if _phrase_key(_split_identifier(column["name"])) == key:
+                    return table, column
+        return None, None
+
+    def join(self, table, other):
+        """Condição de junção por chave estrangeira entre as duas tabelas (ou None)"""
+        for rel in self.relationships:
+            if rel["table"] == table["name"] and rel["foreign_table"] == other["name"]:
+                return f"{table['name']}.{rel['column']} = {other['name']}.{rel['foreign_column']}"
+            if rel["table"] == other["name"] and rel["foreign_table"] == table["name"]:
+                return f"{other['name']}.{rel['column']} = {table['name']}.{rel['foreign_column']}"
+        return None
+
+    def linked(self, table):
+        """Tabelas ligadas à tabela por chave estrangeira"""
+        return [t for t in self.tables.values() if t is not table and self.join(table, t)]
+
+def _key_columns(table, vocabulary):
+    keys = set(table.get("primary_key", []))
+    for rel in vocabulary.relationships:
+        if rel["table"] == table["name"]:
+            keys.add(rel["column"])
+    return keys
+
+def _pick_column(table, type_re, hints, exclude=()):
+    candidates = [
+        c for c in table.get("columns", [])
+        if type_re.search(c["type"] or "") and c["name"] not in exclude
+        and c["name"].lower() != "id" and not c["name"].lower().endswith("_id")
+    ]
+    for hint in hints:
+        for column in candidates:
+            if hint in normalize_question(column["name"]):
+                return column
+    return candidates[0] if candidates else None
+
+def _measure_column(table, vocabulary):
+    return _pick_column(table, NUMERIC_RE, MEASURE_HINTS, exclude=_key_columns(table, vocabulary))
+
+def _label_column(table):
+    return _pick_column(table, TEXT_RE, LABEL_HINTS)
+
+def _date_column(table):
+    return _pick_column(table, DATE_RE, ("data", "date", "criado", "created"))
+
+def _date_bucket(column, unit, db_type):
+    """Expressão que agrupa a data por dia, mês ou ano no dialeto"""
+    if db_type == "MySQL":
+        return {"day": f"DATE({column})", "month": f"DATE_FORMAT({column}, '%Y-%m-01')", "year": f"YEAR({column})"}[unit]
+    if db_type == "SQL Server":
+        return {
+            "day": f"CAST({column} AS DATE)",
+            "month": f"DATEFROMPARTS(YEAR({column}), MONTH({column}), 1)",
+            "year": f"YEAR({column})",
+        }[unit]
+    if db_type == "Oracle":
+        return {"day": f"TRUNC({column}, 'DD')", "month": f"TRUNC({column}, 'MM')", "year": f"TRUNC({column}, 'YYYY')"}[unit]
+    return f"DATE_TRUNC('{unit}', {column})"
+
+def _year_filter(column, year, db_type):
+    if db_type == "SQL Server":
+        return f"YEAR({column}) = {int(year)}"
+    return f"EXTRACT(YEAR FROM {column}) = {int(year)}"
+
+def _resolve_metric(phrase, vocabulary, tables):
+    """Coluna numérica somada para o trecho: coluna com o nome ou valor principal da tabela
+
+    Retorna (tabela, expressão, confiança) ou None.
+    """
+    table, column = vocabulary.column(phrase, tables)
+    if column is not None and NUMERIC_RE.search(column["type"] or ""):
+        return table, f"SUM({table['name']}.{column['name']})", 1.0
+
+    words = phrase.split()
+    if words[:2] in (["quantidade", "de"], ["numero", "de"]):
+        table = vocabulary.table(" ".join(words[2:]))
+        if table is not None:
+            return table, "COUNT(*)", 1.0
+
+    table = vocabulary.table(phrase)
+    if table is not None:
+        measure = _measure_column(table, vocabulary)
+        if measure is not None:
+            # A coluna somada foi escolhida pelo nome ("valor", "total"...), não citada
+            return table, f"SUM({table['name']}.{measure['name']})", 0.9
+    return None
+
+def _resolve_group(phrase, vocabulary, base, db_type):
+    """Expressão de agrupamento: período da data, coluna ou rótulo de uma tabela
+
+    Retorna (expressão exibida, expressões do GROUP BY, tabela extra para o
+    JOIN ou None, confiança) ou None. Ao agrupar por uma tabela, o rótulo
+    (ex.: clientes.nome) vem acompanhado da chave primária, para que
+    entidades com o mesmo nome não sejam somadas juntas; sem chave primária
+    a confiança fica abaixo de templates.min_confidence.
+    """
+    unit = TIME_UNITS.get(_phrase_key(phrase))
+    if unit:
+        date = _date_column(base)
+        if date is None:
+            return None
+        expression = _date_bucket(f"{base['name']}.{date['name']}", unit, db_type)
+        return expression, [expression], None, 1.0
+
+    candidates = [base] + vocabulary.linked(base)
+    table, column = vocabulary.column(phrase, candidates)
+    if column is not None:
+        expression = f"{table['name']}.{column['name']}"
+        return expression, [expression], (table if table is not base else None), 1.0
+
+    table = vocabulary.table(phrase)
+    if table is not None and (table is base or vocabulary.join(base, table)):
+        label = _label_column(table)
+        if label is not None:
+            expression = f"{table['name']}.{label['name']}"
+            keys = [f"{table['name']}.{key}" for key in table.get("primary_key", []) if key != label["name"]]
+            confidence = 0.9 if keys else 0.7
+            return expression, keys + [expression], (table if table is not base else None), confidence
+    return None
+
+def _from_clause(base, other, vocabulary):
+    if other is None:
+        return base["name"]
+    return f"{base['name']}\nJOIN {other['name']} ON {vocabulary.join(base, other)}"
+
+def _aggregate_sql(vocabulary, base, measure, group, group_by, other, year, db_type, order_desc=False, limit=None):
+    where = ""
+    if year:
+        date = _date_column(base)
+        if date is None:
+            return None
+        where = f"\nWHERE {_year_filter(base['name'] + '.' + date['name'], year, db_type)}"
+
+    sql = (
+        f"SELECT {group} AS grupo, {measure} AS total\n"
+        f"FROM {_from_clause(base, other, vocabulary)}{where}\n"
+        f"GROUP BY {', '.join(group_by)}\n"
+        f"ORDER BY {'total DESC' if order_desc else group}"
+    )
+    return add_row_limit(sql, db_type, limit) if limit else sql
+
+def _match_total(match, vocabulary, db_type):
+    """total de X por Y"""
+    metric = _resolve_metric(match.group("metric"), vocabulary, list(vocabulary.tables.values()))
+    if metric is None:
+        return None
+    base, measure, metric_confidence = metric
+
+    group = _resolve_group(match.group("group"), vocabulary, base, db_type)
+    if group is None:
+        return None
+    expression, group_by, other, group_confidence = group
+
+    sql = _aggregate_sql(vocabulary, base, measure, expression, group_by, other, match.group("year"), db_type)
+    return sql and (sql, 0.95 * metric_confidence * group_confidence)
+
+def _match_top(match, vocabulary, db_type):
+    """top N X por Y"""
+    limit = int(match.group("n") or match.group("n2"))
+    entity = match.group("entity")
+    year = match.group("year")
+
+    table = vocabulary.table(entity)
+    if table is not None:
+        label = _label_column(table)
+        # Coluna numérica da própria tabela (ex.: top 5 produtos por preço): sem agregação
+        own_table, own_column = vocabulary.column(match.group("metric"), [table])
+        if own_column is not None and NUMERIC_RE.search(own_column["type"] or "") and label and not year:
+            sql = (
+                f"SELECT {table['name']}.{label['name']}, {table['name']}.{own_column['name']}\n"
+                f"FROM {table['name']}\n"
+                f"ORDER BY {table['name']}.{own_column['name']} DESC"
+            )
+            return add_row_limit(sql, db_type, limit), 0.95
+
+    # Métrica em uma tabela ligada à entidade (ex.: top 5 produtos por vendas)
+    metric = _resolve_metric(match.group("metric"), vocabulary, list(vocabulary.tables.values()))
+    if metric is None:
+        return None
+    base, measure, metric_confidence = metric
+
+    group = _resolve_group(entity, vocabulary, base, db_type)
+    if group is None:
+        return None
+    expression, group_by, other, group_confidence = group
+
+    sql = _aggregate_sql(
+        vocabulary, base, measure, expression, group_by, other, year, db_type, order_desc=True, limit=limit
+    )
+    return sql and (sql, 0.95 * metric_confidence * group_confidence)
+
+def _original_words(question, count):
+    """Últimas `count` palavras da pergunta original (com acentos e maiúsculas)"""
+    words = re.findall(r'\w+', unicodedata.normalize("NFC", question))
+    return " ".join(words[-count:])
+
+def _match_count(match, vocabulary, db_type, question):
+    """quantos X (em Y)"""
+    table = vocabulary.table(match.group("entity"))
+    if table is None:
+        return None
+
+    value = match.group("filter")
+    if not value:
+        return f"SELECT COUNT(*) AS total\nFROM {table['name']}", 0.95
+
+    if re.fullmatch(r'\d{4}', value):
+        date = _date_column(table)
+        if date is None:
+            return None
+        where = _year_filter(f"{table['name']}.{date['name']}", value, db_type)
+        return f"SELECT COUNT(*) AS total\nFROM {table['name']}\nWHERE {where}", 0.9
+
+    # quantos X por Y / em cada Y: contagem agrupada
+    group_phrase = value if match.group("prep") == "por" else None
+    if value.startswith("cada "):
+        group_phrase = value[len("cada "):]
+    if group_phrase:
+        group = _resolve_group(group_phrase, vocabulary, table, db_type)
+        if group is None:
+            return None
+        expression, group_by, other, confidence = group
+        sql = _aggregate_sql(vocabulary, table, "COUNT(*)", expression, group_by, other, None, db_type)
+        return sql, 0.95 * confidence
+
+    candidates = [table] + vocabulary.linked(table)
+    words = value.split()
+    # Coluna citada antes do valor (ex.: "na região Sul", "na cidade de São Paulo"):
+    # o nome da coluna não faz parte do literal
+    candidate, column = vocabulary.column(words[0], candidates)
+    if column is not None and TEXT_RE.search(column["type"] or ""):
+        words = words[1:]
+        while words and words[0] in ("de", "do", "da"):
+            words = words[1:]
+    else:
+        # Valor literal (ex.: quantos clientes em São Paulo): coluna de localização presumida
+        candidate, column = None, None
+        for table_candidate in candidates:
+            picked = _pick_column(table_candidate, TEXT_RE, LOCATION_HINTS)
+            if picked is not None and any(h in normalize_question(picked["name"]) for h in LOCATION_HINTS):
+                candidate, column = table_candidate, picked
+                break
+    if column is None or not words:
+        return None
+
+    literal = _quote(_original_words(question, len(words)))
+    condition = f"UPPER({candidate['name']}.{column['name']}) = UPPER({literal})"
+    source = table["name"] if candidate is table else _from_clause(table, candidate, vocabulary)
+    return f"SELECT COUNT(*) AS total\nFROM {source}\nWHERE {condition}", 0.6
+
+def match_template(question, schema, db_type):
+    """Traduz localmente perguntas simples, sem chamar o modelo
+
+    Reconhece "top N X por Y", "total de X por Y" (Y pode ser dia, mês ou
+    ano) e "quantos X (em Y)", resolvendo X e Y nas tabelas e colunas do
+    schema. Retorna {"sql", "confidence", "template"} ou None. A confiança
+    é menor quando a coluna foi presumida (ex.: o valor somado de "vendas"
+    ou a coluna de localização de um filtro).
+    """
+    if not get_setting("nlp_engine", "templates.enabled", True) or not schema:
+        return None
+
+    normalized = normalize_question(question)
+    vocabulary = SchemaVocabulary(schema)
+    matchers = (
+        ("top", TOP_RE, lambda m: _match_top(m, vocabulary, db_type)),
+        ("total", TOTAL_RE, lambda m: _match_total(m, vocabulary, db_type)),
+        ("count", COUNT_RE, lambda m: _match_count(m, vocabulary, db_type, question)),
+    )
+    for name, pattern, build in matchers:
+        match = pattern.match(normalized)
+        if not match:
+            continue
+        result = build(match)
+        if result:
+            sql, confidence = result
+            return {"sql": sql, "confidence": round(confidence, 2), "template": name}
+    return None
@@ -0,0 +1,11 @@
+import math
+import re
+
+# Palavras longas costumam ser divididas em pedaços de ~4 caracteres pelos tokenizadores BPE
+CHARS_PER_TOKEN = 4
+
+TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+def count_tokens(text):
+    """Estimativa local do número de tokens de um texto (sem chamar a API)"""
+    return sum(math.ceil(len(piece) / CHARS_PER_TOKEN) for piece in TOKEN_RE.findall(text or ""))
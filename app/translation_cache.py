@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from pool import pool_label
+from settings import get_setting
+
+# Arquivo onde as traduções pergunta -> SQL são persistidas entre reinicializações
+TRANSLATION_CACHE_FILE = get_setting("nlp_engine", "translation_cache.file", "translation_cache.json")
+
+_cache = None  # chave -> entrada, da menos para a mais recentemente usada
+_lock = threading.RLock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidations": 0}
+
+def normalize_question(question):
+    """Normaliza a pergunta: minúsculas, sem acentos, pontuação ou espaços extras"""
+    text = unicodedata.normalize("NFKD", question or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r'[^\w\s]', ' ', text.lower())
+    return re.sub(r'\s+', ' ', text).strip()
+
+def singularize(word):
+    """Forma singular aproximada de uma palavra normalizada (vendas -> venda, regioes -> regiao, itens -> item)"""
+    for suffix, replacement in (("oes", "ao"), ("aes", "ao"), ("ns", "m"), ("is", "l"),
+                                ("res", "r"), ("zes", "z"), ("ses", "s"), ("s", "")):
+        if len(word) > 3 and word.endswith(suffix):
+            return word[:-len(suffix)] + replacement
+    return word
+
+def schema_fingerprint(schema):
+    """Impressão digital do conteúdo do schema usado no prompt"""
+    text = json.dumps(schema, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+def _cache_key(question, fingerprint, model_settings):
+    settings = json.dumps(model_settings, sort_keys=True)
+    text = f"{normalize_question(question)}\n{fingerprint}\n{settings}"
+    return hashlib.sha1(text.encode()).hexdigest()
+
+def _load_cache_file():
+    """Carrega o cache persistido em disco"""
+    if not os.path.exists(TRANSLATION_CACHE_FILE):
+        return OrderedDict()
+
+    try:
+        with open(TRANSLATION_CACHE_FILE, 'r') as f:
+            entries = json.load(f)
+    except:
+        return OrderedDict()
+
+    return OrderedDict(sorted(entries.items(), key=lambda item: item[1].get("last_used", 0)))
+
+def _save_cache_file(cache):
+    """Salva o cache em disco (escrita atômica)"""
+    tmp_file = f"{TRANSLATION_CACHE_FILE}.tmp"
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, TRANSLATION_CACHE_FILE)
+    except OSError:
+        pass
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = _load_cache_file()
+    return _cache
+
+def _enabled():
+    return get_setting("nlp_engine", "translation_cache.enabled", True)
+
+def get_translation(question, db_info, fingerprint, model_settings):
+    """Retorna o SQL já gerado para a pergunta neste schema e modelo (ou None)"""
+    if not _enabled():
+        return None
+
+    ttl = get_setting("nlp_engine", "translation_cache.ttl", 7 * 24 * 3600)
+    key = _cache_key(question, fingerprint, model_settings)
+    now = time.time()
+
+    with _lock:
+        cache = _get_cache()
+        entry = cache.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+
+        if ttl and now - entry["created_at"] >= ttl:
+            del cache[key]
+            _stats["expired"] += 1
+            _stats["misses"] += 1
+            _save_cache_file(cache)
+            return None
+
+        entry["last_used"] = now
+        entry["hits"] = entry.get("hits", 0) + 1
+        cache.move_to_end(key)
+        _stats["hits"] += 1
+        return entry["sql"]
+
+def store_translation(question, db_info, fingerprint, model_settings, sql):
+    """Guarda a tradução gerada pelo modelo, descartando as menos usadas acima do limite"""
+    if not _enabled():
+        return
+
+    max_entries = get_setting("nlp_engine", "translation_cache.max_entries", 5000)
+    connection = pool_label(db_info)
+    key = _cache_key(question, fingerprint, model_settings)
+    now = time.time()
+
+    with _lock:
+        cache = _get_cache()
+
+        # O schema da conexão mudou: as traduções anteriores não valem mais
+        stale = [
+            k for k, entry in cache.items()
+            if entry["connection"] == connection and entry["schema_fingerprint"] != fingerprint
+        ]
+        for k in stale:
+            del cache[k]
+        _stats["invalidations"] += len(stale)
+
+        cache[key] = {
+            "question": question,
+            "normalized": normalize_question(question),
+            "connection": connection,
+            "schema_fingerprint": fingerprint,
+            "model": model_settings,
+            "sql": sql,
+            "created_at": now,
+            "last_used": now,
+            "hits": 0,
+        }
+        cache.move_to_end(key)
+
+        while max_entries and len(cache) > max_entries:
+            cache.popitem(last=False)
+            _stats["evictions"] += 1
+
+        _save_cache_file(cache)
+
+def invalidate(question=None, sql=None, db_info=None):
+    """Remove traduções pela pergunta, pelo SQL gerado ou pela conexão (sem filtros, todas)"""
+    normalized = normalize_question(question) if question else None
+    connection = pool_label(db_info) if db_info else None
+
+    with _lock:
+        cache = _get_cache()
+        keys = [
+            k for k, entry in cache.items()
+            if (normalized is None or entry["normalized"] == normalized)
+            and (sql is None or entry["sql"].strip() == sql.strip())
+            and (connection is None or entry["connection"] == connection)
+        ]
+        for k in keys:
+            del cache[k]
+        _stats["invalidations"] += len(keys)
+        _save_cache_file(cache)
+    return len(keys)
+
+def get_cache_stats():
+    """Estatísticas de uso do cache de traduções"""
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_get_cache())
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
@@ -5,6 +5,11 @@ import os
 from datetime import datetime
 import uuid
 
+from prepared import parameterize_sql
+from pool import pool_label
+from settings import get_setting
+import example_index
+
 # Constantes para armazenamento
 QUERY_HISTORY_FILE = "query_history.json"
 SAVED_QUERIES_FILE = "saved_queries.json"
@@ -58,7 +63,7 @@ def _save_gold_list(gold_list):
     with open(GOLD_LIST_FILE, 'w') as f:
         json.dump(gold_list, f, indent=2)
 
-def save_query(query_text, sql_text, user_email, category=None, name=None):
+def save_query(query_text, sql_text, user_email, category=None, name=None, db_info=None):
     """Salva uma consulta no histórico e opcionalmente como consulta salva"""
     
     # Adicionar ao histórico
@@ -70,7 +75,8 @@ def save_query(query_text, sql_text, user_email, category=None, name=None):
         "user_email": user_email,
         "query_text": query_text,
         "sql_text": sql_text,
-        "status": "success"  # Assumindo sucesso
+        "status": "success",  # Assumindo sucesso
+        "connection": pool_label(db_info) if db_info else None
     }
     
     history.append(history_entry)
@@ -80,6 +86,9 @@ def save_query(query_text, sql_text, user_email, category=None, name=None):
     if name:
         saved_queries = _get_saved_queries()
         
+        # Literais dos filtros viram parâmetros para reexecução com outros valores
+        sql_template, parameters = parameterize_sql(sql_text)
+        
         saved_entry = {
             "id": str(uuid.uuid4()),
             "name": name,
@@ -88,7 +97,10 @@ def save_query(query_text, sql_text, user_email, category=None, name=None):
             "user_email": user_email,
             "query_text": query_text,
             "sql_text": sql_text,
-            "starred": False
+            "sql_template": sql_template,
+            "parameters": parameters,
+            "starred": False,
+            "connection": pool_label(db_info) if db_info else None
         }
         
         saved_queries.append(saved_entry)
@@ -132,8 +144,8 @@ def get_saved_queries(user_email, category=None):
     
     return user_queries
 
-def add_to_gold_list(query_text, sql_text, user_email):
-    """Adiciona uma consulta à lista de exemplos de referência"""
+def add_to_gold_list(query_text, sql_text, user_email, db_info=None):
+    """Adiciona uma consulta à lista de exemplos de referência (associada à conexão, se informada)"""
     gold_list = _get_gold_list()
     
     # Verificar se consulta similar já existe
@@ -147,14 +159,17 @@ def add_to_gold_list(query_text, sql_text, user_email):
         "query": query_text,
         "sql": sql_text,
         "added_at": datetime.now().isoformat(),
-        "added_by": user_email
+        "added_by": user_email,
+        "connection": pool_label(db_info) if db_info else None
     })
     
-    # Limitar a lista a 100 exemplos
-    if len(gold_list) > 100:
-        gold_list = gold_list[-100:]
+    # Limitar a lista (nlp_engine.gold_list_size); os exemplos usados no prompt vêm do índice
+    max_size = get_setting("nlp_engine", "gold_list_size", 50000)
+    if max_size and len(gold_list) > max_size:
+        gold_list = gold_list[-max_size:]
     
     _save_gold_list(gold_list)
+    example_index.add_example(query_text, sql_text, db_info)
     return True
 
 def get_gold_list():
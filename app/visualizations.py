@@ -81,7 +81,7 @@ def suggest_visualization(df):
     
     # Identificar os tipos de colunas
     numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-    text_cols = df.select_dtypes(include=['object']).columns.tolist()
+    text_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
     date_cols = [col for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])]
     
     suggestion = {}